@@ -2,7 +2,7 @@
 from PySide6.QtCore import Slot, QTimer, QUrl
 from PySide6.QtWidgets import (
     QMainWindow, QProgressBar, QPushButton, QFileDialog, 
-    QSizePolicy
+    QSizePolicy, QTableView
 )
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtWebEngineCore import QWebEngineSettings
@@ -10,10 +10,12 @@ import pandas as pd
 import json
 
 from gui.web_components import CustomWebEnginePage, NetworkInterceptor
+from gui.table_model import DataFrameTableModel
 from workers.thread_worker import GenericWorkerThread
 from utils.file_handlers import FileHandler
 from utils.text_analysis import TextAnalyzer
 from utils.web_analysis import WebAnalyzer
+from utils.sitemap_result import SitemapResult, parquet_available
 from ui_form import Ui_MainWindow
 
 class MainWindow(QMainWindow):
@@ -23,9 +25,11 @@ class MainWindow(QMainWindow):
         self.ui.setupUi(self)
         self.setup_ui()
         self.setup_web_view()
+        self.setup_table_view()
         self.setup_connections()
         self.fileInput = ""
         self.fileOutput = ""
+        self.sitemap_result = None
 
     def setup_ui(self):
         # Créer une barre de progression dans la statusbar
@@ -62,6 +66,25 @@ class MainWindow(QMainWindow):
         self.web_view.setMinimumSize(200, 200)
         self.ui.verticalLayout_2.addWidget(self.web_view)
 
+    def setup_table_view(self):
+        # Tableau virtualisé pour les gros résultats (seules les lignes visibles sont rendues)
+        self.table_model = DataFrameTableModel()
+        self.table_view = QTableView()
+        self.table_view.setModel(self.table_model)
+        self.table_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.table_view.verticalHeader().setDefaultSectionSize(20)
+        self.table_view.hide()
+        self.ui.verticalLayout.addWidget(self.table_view)
+
+    def show_table(self, frame):
+        self.table_model.setFrame(frame)
+        self.table_view.show()
+
+    def hide_table(self):
+        self.sitemap_result = None
+        self.table_model.setFrame(None)
+        self.table_view.hide()
+
     def setup_connections(self):
         # Connecter les boutons aux fonctions
         self.ui.pushButton_open.clicked.connect(self.openFileDiablog)
@@ -75,8 +98,10 @@ class MainWindow(QMainWindow):
         self.ui.pushButton_json.clicked.connect(self.decryptBotifyFilter)
         self.ui.pushButton_json_validate.clicked.connect(self.JSON_validation)
         self.save_button.clicked.connect(self.saveToFile)
+        self.ui.tabWidget.currentChanged.connect(lambda _index: self.hide_table())
 
     def run_long_task(self, task_function, *args, **kwargs):
+        self.hide_table()
         self.progress_bar.setValue(0)
         self.progress_bar.show()
 
@@ -127,21 +152,32 @@ class MainWindow(QMainWindow):
     def openFileDiablog(self):
         self.fileInput, _ = QFileDialog.getOpenFileName(
             self, "Open File", "", 
-            "Zip File (*.zip);;CSV File (*.csv);;Text File (*.txt);;All Files (*)"
+            "Zip File (*.zip);;CSV File (*.csv);;Gzip File (*.gz);;Text File (*.txt);;All Files (*)"
         )
         if self.fileInput:
             self.ui.labelFilename.setText("Selected File:" + str(self.fileInput))
 
     def saveFileDiablog(self):
-        self.fileOutput, _ = QFileDialog.getSaveFileName(
-            self, "Save File", "",
-            "CSV File (*.csv);;Text File (*.txt);;JSON File (*.json);;All Files (*)"
-        )
+        filters = "CSV File (*.csv);;Text File (*.txt);;JSON File (*.json);;"
+        if parquet_available():
+            filters += "Parquet File (*.parquet);;"
+        self.fileOutput, _ = QFileDialog.getSaveFileName(self, "Save File", "", filters + "All Files (*)")
 
     def saveToFile(self):
         self.saveFileDiablog()
         if self.fileOutput:
-            FileHandler.save_to_file(self.fileOutput, self.ui.textBrowserOutput.toPlainText())
+            try:
+                if self.sitemap_result is not None:
+                    # Export direct du tableau plutôt que du texte affiché
+                    self.sitemap_result.export(self.fileOutput)
+                elif self.table_model.frame() is not None:
+                    self.table_model.frame().to_csv(self.fileOutput, index=False)
+                else:
+                    FileHandler.save_to_file(self.fileOutput, self.ui.textBrowserOutput.toPlainText())
+            except (ImportError, OSError, ValueError) as e:
+                # Raised inside a Qt slot, the error would otherwise be lost
+                self.ui.textBrowserOutput.append(f"Error: could not save {self.fileOutput}: {e}")
+                return
             self.progress_bar.setValue(100)
 
     # Query Parameter Methods
@@ -170,7 +206,8 @@ class MainWindow(QMainWindow):
             self.run_long_task(
                 TextAnalyzer.analyze_keywords,
                 self.fileInput,
-                language
+                language,
+                engine='parallel'
             )
         else:
             self.ui.textBrowserOutput.append("Please choose a file first")
@@ -204,19 +241,20 @@ class MainWindow(QMainWindow):
     # Sitemap Methods
     def launchSitemap(self):
         if self.ui.lineEdit_sitemap.text().strip():
+            self.hide_table()
             self.ui.textBrowserOutput.clear()
             self.ui.textBrowserOutput.append("Analyzing sitemap...")
             
             def on_sitemap_result(result):
-                if isinstance(result, str):
-                    # Si le résultat contient des tabulations, on utilise une police monospace
-                    if "\t" in result:
-                        formatted_result = result.replace("\n", "<br>").replace("\t", "&nbsp;&nbsp;&nbsp;&nbsp;")
-                        self.ui.textBrowserOutput.setHtml(
-                            f'<pre style="font-family: Courier, monospace;">{formatted_result}</pre>'
-                        )
-                    else:
-                        self.ui.textBrowserOutput.setPlainText(result)
+                self.progress_bar.setValue(100)
+                QTimer.singleShot(1000, self.progress_bar.hide)
+                if isinstance(result, SitemapResult):
+                    # Le détail va dans le tableau, seul le résumé reste dans la zone de texte
+                    self.sitemap_result = result
+                    self.ui.textBrowserOutput.setPlainText(result.summary_text())
+                    self.show_table(result.frame)
+                elif isinstance(result, str):
+                    self.ui.textBrowserOutput.setPlainText(result)
 
             # Connecter le signal de mise à jour du texte
             self.worker_thread = GenericWorkerThread(
@@ -249,20 +287,45 @@ class MainWindow(QMainWindow):
         user_agent = self.ui.comboBox_ua.currentText()
         robots_content = self.ui.plainTextEdit_rules.toPlainText()
 
-        if not all([urls, user_agent, robots_content]):
+        if not all([urls, user_agent]):
             self.ui.textBrowserOutput.append("Please fill all required fields")
             return
 
-        results = WebAnalyzer.check_urls_against_robots(urls, robots_content, user_agent)
+        self.hide_table()
+        self.ui.textBrowserOutput.clear()
+        self.ui.textBrowserOutput.append("Checking URLs...")
+
+        def on_robots_result(verdicts):
+            self.progress_bar.setValue(100)
+            QTimer.singleShot(1000, self.progress_bar.hide)
+            self.display_robots_results(verdicts)
+
+        # La vérification tourne dans un thread, l'interface reste utilisable sur de longues listes
+        if robots_content.strip():
+            self.worker_thread = GenericWorkerThread(
+                WebAnalyzer.evaluate_robots, urls, robots_content, user_agent
+            )
+        else:
+            # Sans règles collées, chaque URL est vérifiée avec le robots.txt de son hôte
+            self.worker_thread = GenericWorkerThread(
+                WebAnalyzer.check_urls_by_host, urls, user_agent
+            )
+        self.worker_thread.update_progress.connect(self.update_progress_bar)
+        self.worker_thread.calculation_finished.connect(on_robots_result)
+        self.worker_thread.error_occurred.connect(self.handle_task_error)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.worker_thread.start()
+
+    def display_robots_results(self, verdicts):
+        blocked = sum(1 for verdict in verdicts if not verdict.allowed)
         self.ui.textBrowserOutput.clear()
         self.ui.textBrowserOutput.append("Verification results:")
-        self.ui.textBrowserOutput.append("")
-        
-        for url, is_allowed in results:
-            if is_allowed:
-                self.ui.textBrowserOutput.append(f"✅ {url}")
-            else:
-                self.ui.textBrowserOutput.append(f'<span style="color: red;">❌ {url}</span>')
+        self.ui.textBrowserOutput.append(f"✅ {len(verdicts) - blocked} allowed")
+        self.ui.textBrowserOutput.append(f'<span style="color: red;">❌ {blocked} blocked</span>')
+        frame = pd.DataFrame.from_records(verdicts, columns=["URL", "Allowed", "Matched rule"])
+        frame["Matched rule"] = frame["Matched rule"].fillna("")
+        self.show_table(frame)
 
     # Botify Filter Methods
     def decryptBotifyFilter(self):
@@ -0,0 +1,39 @@
+# This Python file uses the following encoding: utf-8
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    # The view only asks for the visible cells, so millions of rows stay responsive
+    def __init__(self, frame=None, parent=None):
+        super().__init__(parent)
+        self._frame = frame
+
+    def setFrame(self, frame):
+        self.beginResetModel()
+        self._frame = frame
+        self.endResetModel()
+
+    def frame(self):
+        return self._frame
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._frame is None:
+            return 0
+        return len(self._frame)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._frame is None:
+            return 0
+        return len(self._frame.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self._frame.iat[index.row(), index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or self._frame is None:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self._frame.columns[section])
+        return str(section + 1)
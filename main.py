@@ -1,9 +1,12 @@
 # This Python file uses the following encoding: utf-8
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from gui.main_window import MainWindow
 
 if __name__ == "__main__":
+    # Needed by the process pools once frozen by PyInstaller
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     widget = MainWindow()
     widget.show()
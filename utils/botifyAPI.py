@@ -1,21 +1,33 @@
 import requests
-import polling
 import gzip
 import shutil
 import random
+import math
 import time
+from collections import Counter, defaultdict
 import json
 import urllib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
+from utils.http_transport import get_default_transport
+from utils.job_manager import get_default_job_manager
+from utils.export_stream import iter_export_rows, iter_export_chunks
+from utils.response_cache import ResponseCache
+from utils.rate_limiter import get_limiter_stats
+from utils.speedworkers_refresh import RefreshScheduler
 
 
 
 class BotifyAPI:
-    def __init__(self, token, username, project_slug, debug=False):
+    def __init__(self, token, username, project_slug, debug=False, transport=None, jobManager=None, cache=None):
         self.token = token
         self.username = username
         self.project_slug = project_slug
         self.debug = debug
+        self.transport = transport or get_default_transport()
+        self.jobManager = jobManager or get_default_job_manager()
+        self.cache = cache
         self.headers = {
             "Authorization": "Token {0}".format(self.token),
             "Content-type": "application/json"
@@ -23,28 +35,67 @@ class BotifyAPI:
 
     def __get(self,url):
         try:
-            r = requests.get(url, headers=self.headers)
+            r = self.transport.get(url, headers=self.headers)
         except requests.exceptions.RequestException as e:
             print(e)
             return False
         return r.json()
 
-    def __post(self, url, data):
+    def __post(self, url, data, retry=True):
         try:
-            r = requests.post(url, headers=self.headers, data=data)
+            r = self.transport.post(url, headers=self.headers, data=data, retry=retry)
         except requests.exceptions.RequestException as e:
             print(e)
             return False
         return r.json()
 
+    def __cachedGet(self, url, endpoint):
+        if self.cache is None:
+            return self.__get(url)
+        key = self.cache.make_key("GET", url)
+        found, results = self.cache.lookup(key, endpoint)
+        if found:
+            if self.debug:
+                pprint("Cache hit " + url)
+            return results
+        results = self.__get(url)
+        if not results or "error" in results:
+            return results
+        self.cache.store(key, results, endpoint, self._cacheScope())
+        if endpoint == "lastAnalysis" and results.get("results"):
+            # A new analysis makes every cached answer of the project stale
+            if self.cache.track_analysis(self._cacheScope(), results["results"][0].get("slug"), keep_key=key):
+                if self.debug:
+                    pprint("New analysis found, cache invalidated for " + self._cacheScope())
+        return results
+
+    def _cacheScope(self):
+        return "{0}/{1}".format(self.username, self.project_slug)
+
     def setDebug(self, newValue):
         self.debug = newValue
 
+    def enableCache(self, cache=None, **kwargs):
+        self.cache = cache or ResponseCache(**kwargs)
+        return self.cache
+
+    def disableCache(self):
+        self.cache = None
+
+    def getCacheStats(self):
+        return self.cache.get_stats() if self.cache else {}
+
+    def getTransportStats(self):
+        return self.transport.get_stats()
+
+    def getRateLimitStats(self):
+        return get_limiter_stats()
+
     def getLastAnalysis(self):
         urlGetLastProject = "https://api.botify.com/v1/analyses/{0}/{1}/light".format(self.username, self.project_slug)
         if self.debug:
             pprint("getLastProjects " + urlGetLastProject)
-        results = self.__get(urlGetLastProject)
+        results = self.__cachedGet(urlGetLastProject, "lastAnalysis")
         if self.debug:
             pprint(results)
 
@@ -54,7 +105,7 @@ class BotifyAPI:
         urlGetLastProject = "https://api.botify.com/v1/analyses/{0}/{1}".format(self.username, self.project_slug)
         if self.debug:
             pprint("getLastProjects " + urlGetLastProject)
-        results = self.__get(urlGetLastProject)
+        results = self.__cachedGet(urlGetLastProject, "lastAnalysis")
         if self.debug:
             pprint(results)
 
@@ -73,7 +124,7 @@ class BotifyAPI:
                                                                                         self.project_slug, Analyse)
         if self.debug:
             pprint("getAnalysisSummary " + urlgetAnalysisSummary)
-        results = self.__get(urlgetAnalysisSummary)
+        results = self.__cachedGet(urlgetAnalysisSummary, "analysisSummary")
         if self.debug:
             pprint(results)
         return results
@@ -128,9 +179,10 @@ class BotifyAPI:
         return results
 
 
-    def getUrlDetails(self, Analyse, BQLRequest):
+    def getUrlDetails(self, Analyse, BQLRequest, page=None, size=None):
         urlList = "https://api.botify.com/v1/analyses/{0}/{1}/{2}/urls".format(self.username, self.project_slug,
                                                                                Analyse)
+        urlList += self._pageParams(page, size)
         if self.debug:
             pprint("getUrlDetails " + urlList)
         results = self.__post(urlList, BQLRequest)
@@ -154,7 +206,7 @@ class BotifyAPI:
                                                                                         self.project_slug)
         if self.debug:
             pprint("getProjectCollections " + allCollections)
-        results = self.__get(allCollections)
+        results = self.__cachedGet(allCollections, "collections")
         if self.debug:
             pprint(results)
         return results
@@ -164,14 +216,16 @@ class BotifyAPI:
                                                                                         self.project_slug, collectionID)
         if self.debug:
             pprint("getCollectionDetail " + collection)
-        results = self.__get(collection)
+        results = self.__cachedGet(collection, "collectionDetail")
         if self.debug:
             pprint(results)
         return results
 
-    def projectQuery(self, BQLRequest, page=1, count=False):
+    def projectQuery(self, BQLRequest, page=1, count=False, size=None):
         queryCollection = "https://api.botify.com/v1/projects/{0}/{1}/query?page={2}".format(self.username,
                                                                                           self.project_slug, page)
+        if size:
+            queryCollection+="&size={0}".format(size)
         if count:
             queryCollection+="&count"
 
@@ -182,12 +236,72 @@ class BotifyAPI:
             pprint(results)
         return results
 
+    def _pageParams(self, page=None, size=None):
+        params = []
+        if page:
+            params.append("page={0}".format(page))
+        if size:
+            params.append("size={0}".format(size))
+        return "?" + "&".join(params) if params else ""
+
+    def _iterPages(self, url, BQLRequest):
+        # The next page is fetched in the background while the current one is consumed
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self.__post, url, BQLRequest)
+            while future is not None:
+                results = future.result()
+                if not results or "results" not in results:
+                    if self.debug:
+                        pprint("Pagination stopped on " + url)
+                        pprint(results)
+                    # Stopping silently would pass a failed query off as an empty or truncated result
+                    raise Exception("Query failed on " + url + ": " + str(results))
+                nextUrl = results.get("next")
+                if nextUrl and not results["results"]:
+                    raise Exception("Empty page on " + url + " before the end of pagination")
+                url = nextUrl
+                future = executor.submit(self.__post, url, BQLRequest) if url else None
+                if self.debug:
+                    pprint("Page received, next " + str(url))
+                yield results["results"]
+        finally:
+            executor.shutdown(wait=False)
+
+    def _iterRows(self, pages, asDataFrame):
+        if asDataFrame:
+            import pandas as pd
+            for rows in pages:
+                yield pd.json_normalize(rows)
+        else:
+            for rows in pages:
+                yield from rows
+
+    def iterQuery(self, BQLRequest, size=500, asDataFrame=False):
+        queryCollection = "https://api.botify.com/v1/projects/{0}/{1}/query".format(self.username,
+                                                                                   self.project_slug)
+        queryCollection += self._pageParams(1, size)
+        if self.debug:
+            pprint("iterQuery " + queryCollection)
+        return self._iterRows(self._iterPages(queryCollection, BQLRequest), asDataFrame)
+
+    def iterUrlDetails(self, Analyse, BQLRequest, size=500, asDataFrame=False):
+        urlList = "https://api.botify.com/v1/analyses/{0}/{1}/{2}/urls".format(self.username, self.project_slug,
+                                                                               Analyse)
+        urlList += self._pageParams(1, size)
+        if self.debug:
+            pprint("iterUrlDetails " + urlList)
+        return self._iterRows(self._iterPages(urlList, BQLRequest), asDataFrame)
+
     def _checkJob(self, url):
         if self.debug:
             pprint("Check Status " + url)
         results = self.__get(url)
         if self.debug:
             pprint(results)
+        if not results:
+            # Network error, the job will be checked again later
+            return False
 
         if "job_status" in results and results["job_status"] == "DONE":
             if "download_url" in results["results"]:
@@ -206,11 +320,15 @@ class BotifyAPI:
         else:
             return False
 
-    def launchJob(self, BQLRequest):
+    def _watchJob(self, urlJobStatus, callback=None, timeout=None):
+        return self.jobManager.submit(lambda: self._checkJob(urlJobStatus), callback=callback, timeout=timeout)
+
+    def submitJob(self, BQLRequest, callback=None, timeout=None):
         jobUrl = "https://api.botify.com/v1/jobs"
         if self.debug:
-            pprint("launchJob " + jobUrl)
-        results = self.__post(jobUrl, BQLRequest)
+            pprint("submitJob " + jobUrl)
+        # Not retried: a retry after a lost response would launch the job twice
+        results = self.__post(jobUrl, BQLRequest, retry=False)
         if self.debug:
             pprint(results)
         if results and "job_status" in results and results["job_status"] == "CREATED":
@@ -218,27 +336,16 @@ class BotifyAPI:
             urlgetUrlsExportStatus = "{0}/{1}".format(jobUrl, jobID)
             if self.debug:
                 pprint("JobUrl " + urlgetUrlsExportStatus)
-            try:
-                urlDownload = polling.poll(
-                    lambda: self._checkJob(urlgetUrlsExportStatus),
-                    step=30,
-                    poll_forever=3600)
-                if self.debug:
-                    pprint("URL is " + str(urlDownload))
-                return urlDownload
-            except Exception as e:
-                if self.debug:
-                    pprint("Job failed during polling: " + str(e))
-                return False
+            return self._watchJob(urlgetUrlsExportStatus, callback, timeout)
         else:
             return False
 
-    def getCSVExport(self, Analyse, BQLRequest):
+    def submitCSVExport(self, Analyse, BQLRequest, callback=None, timeout=None):
         createUrlsExport = "https://api.botify.com/v1/analyses/{0}/{1}/{2}/urls/export".format(self.username,
                                                                         self.project_slug, Analyse)
         if self.debug:
-            pprint("getCSVExport " + createUrlsExport)
-        results = self.__post(createUrlsExport,BQLRequest)
+            pprint("submitCSVExport " + createUrlsExport)
+        results = self.__post(createUrlsExport, BQLRequest, retry=False)
         if self.debug:
             pprint(results)
         if results["job_status"] == "CREATED":
@@ -246,20 +353,37 @@ class BotifyAPI:
             # analyses/{username}/{project_slug}/{analysis_slug}/urls/export/{url_export_id}
             urlgetUrlsExportStatus = "{0}/{1}".format(createUrlsExport, jobID)
             if self.debug:
-                pprint("getCSVExport " + urlgetUrlsExportStatus)
-            urlDownload = polling.poll(
-                lambda: self._checkJob(urlgetUrlsExportStatus),
-                step=30,
-                poll_forever=3600)
+                pprint("submitCSVExport " + urlgetUrlsExportStatus)
+            return self._watchJob(urlgetUrlsExportStatus, callback, timeout)
+        else:
+            return False
+
+    def launchJob(self, BQLRequest):
+        job = self.submitJob(BQLRequest)
+        if not job:
+            return False
+        try:
+            urlDownload = job.result()
             if self.debug:
-                pprint("URL is " + urlDownload)
+                pprint("URL is " + str(urlDownload))
             return urlDownload
-        else:
+        except Exception as e:
+            if self.debug:
+                pprint("Job failed during polling: " + str(e))
             return False
 
+    def getCSVExport(self, Analyse, BQLRequest):
+        job = self.submitCSVExport(Analyse, BQLRequest)
+        if not job:
+            return False
+        urlDownload = job.result()
+        if self.debug:
+            pprint("URL is " + str(urlDownload))
+        return urlDownload
+
     def downloadFile(self, url):
         local_filename = url.split('/')[-1]
-        response = requests.get(url, stream=True)
+        response = self.transport.get(url, stream=True)
         with open(local_filename, 'wb') as f:
             response.raw.decode_content = True
             shutil.copyfileobj(response.raw, f)
@@ -269,13 +393,131 @@ class BotifyAPI:
         with gzip.open(fileGz, 'r') as f_in, open(fileOut, 'wb') as f_out:
             shutil.copyfileobj(f_in, f_out)
 
+    def iterExport(self, url, asDataFrame=False, chunksize=100000, usecols=None, spillPath=None, checksum=None):
+        # Download, gunzip and parse in a single pass, nothing is written to disk unless spillPath is set
+        if self.debug:
+            pprint("iterExport " + url)
+        if asDataFrame:
+            return iter_export_chunks(self.transport, url, spill_path=spillPath, checksum=checksum,
+                                      chunksize=chunksize, usecols=usecols)
+        return iter_export_rows(self.transport, url, spill_path=spillPath, checksum=checksum)
+
+    def asyncClient(self, concurrency=10):
+        return AsyncBotifyAPI(self.token, self.username, self.project_slug, self.debug,
+                              concurrency=concurrency, api=self)
+
+    def getUrlDetailBatch(self, Analyse, URLs, Fields, concurrency=10):
+        async def collect():
+            async with self.asyncClient(concurrency) as client:
+                return {URL: result async for URL, result in client.batchUrlDetail(Analyse, URLs, Fields)}
+        return asyncio.run(collect())
+
+    def projectQueryBatch(self, BQLRequests, page=1, concurrency=10):
+        BQLRequests = list(BQLRequests)
+
+        async def collect():
+            async with self.asyncClient(concurrency) as client:
+                results = [None] * len(BQLRequests)
+                async for index, result in client.batchProjectQuery(BQLRequests, page):
+                    results[index] = result
+                return results
+        return asyncio.run(collect())
+
+
+class AsyncBotifyAPI:
+    # Each call runs the blocking BotifyAPI method in a worker thread, the pooled
+    # transport keeps the connections alive between calls.
+    def __init__(self, token, username, project_slug, debug=False, concurrency=10, api=None, transport=None):
+        self.api = api or BotifyAPI(token, username, project_slug, debug, transport=transport)
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def _getSemaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run(self, function, *args):
+        async with self._getSemaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, function, *args)
+
+    async def getUrlDetail(self, Analyse, URL, Fields):
+        return await self._run(self.api.getUrlDetail, Analyse, URL, Fields)
+
+    async def getUrlHTML(self, Analyse, URL):
+        return await self._run(self.api.getUrlHTML, Analyse, URL)
+
+    async def getUrlDetails(self, Analyse, BQLRequest):
+        return await self._run(self.api.getUrlDetails, Analyse, BQLRequest)
+
+    async def projectQuery(self, BQLRequest, page=1, count=False):
+        return await self._run(self.api.projectQuery, BQLRequest, page, count)
+
+    async def getCollectionDetail(self, collectionID):
+        return await self._run(self.api.getCollectionDetail, collectionID)
+
+    async def asCompleted(self, call, items):
+        # Only a window of tasks is scheduled at once so that huge iterables stay cheap
+        window = self.concurrency * 2
+        items = iter(items)
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[asyncio.ensure_future(call(item))] = item
+            if not pending:
+                return
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    if self.api.debug:
+                        pprint("Error for {0}: {1}".format(item, e))
+                    result = False
+                yield item, result
+
+    async def batchUrlDetail(self, Analyse, URLs, Fields):
+        async for URL, result in self.asCompleted(lambda URL: self.getUrlDetail(Analyse, URL, Fields), URLs):
+            yield URL, result
+
+    async def batchUrlHTML(self, Analyse, URLs):
+        async for URL, result in self.asCompleted(lambda URL: self.getUrlHTML(Analyse, URL), URLs):
+            yield URL, result
+
+    async def batchProjectQuery(self, BQLRequests, page=1):
+        async for (index, _), result in self.asCompleted(
+                lambda item: self.projectQuery(item[1], page), enumerate(BQLRequests)):
+            yield index, result
+
 class SpeedWorkersAPI:
-    def __init__(self, deliveryToken, inventoryToken, websiteId, clusterId, debug=False):
+    def __init__(self, deliveryToken, inventoryToken, websiteId, clusterId, debug=False, transport=None,
+                 inventoryUrl=None):
         self.deliveryToken = deliveryToken
         self.inventoryToken = inventoryToken
         self.websiteId = websiteId
         self.clusterId = clusterId
         self.debug = debug
+        self.transport = transport or get_default_transport()
+        # Can point to a local stub server for tests
+        self.inventoryUrl = inventoryUrl
         self.inventoryHeaders = {
             "X-Sw-Website-Id": "{0}".format(self.websiteId),
             "X-Sw-Token": "{0}".format(self.inventoryToken),
@@ -290,7 +532,7 @@ class SpeedWorkersAPI:
 
     def __get(self, url, headers):
         try:
-            r = requests.get(url, headers=headers)
+            r = self.transport.get(url, headers=headers)
         except requests.exceptions.RequestException as e:
             print(e)
             return False
@@ -298,7 +540,7 @@ class SpeedWorkersAPI:
 
     def __post(self, url, headers, data):
         try:
-            r = requests.post(url, headers=headers, data=data)
+            r = self.transport.post(url, headers=headers, data=data)
         except requests.exceptions.RequestException as e:
             print(e)
             return False
@@ -307,42 +549,111 @@ class SpeedWorkersAPI:
     def setDebug(self, newValue):
         self.debug = newValue
 
+    def getTransportStats(self):
+        return self.transport.get_stats()
+
     def divide_chunks(self, l, n):
         # looping till length l
         for i in range(0, len(l), n):
             yield l[i:i + n]
 
-    def checkConnectionEcho(self, url, userAgent="botify-bot-sw-test"):
-        headers=self.deliveryHeaders
-        randomNumber=str(random.randrange(10000,99999))
+    def _echoCheck(self, url, userAgent="botify-bot-sw-test"):
+        # Each call works on its own copy of the headers so that checks can run in parallel
+        headers = dict(self.deliveryHeaders)
+        randomNumber = str(random.randrange(10000,99999))
         headers["X-Sw-Options"] = "echo-{0}".format(randomNumber)
         headers["User-Agent"] = userAgent
         if self.debug:
             pprint("headers sent")
             pprint(headers)
-        response = self.__get(url, headers=headers)
+        result = {
+            "url": url,
+            "userAgent": userAgent,
+            "echoSent": randomNumber,
+            "echoReceived": None,
+            "swStatus": None,
+            "statusCode": None,
+            "latency": None,
+            "echo": False,
+            "error": None
+        }
+        started = time.perf_counter()
+        try:
+            response = self.transport.get(url, headers=headers)
+        except requests.exceptions.RequestException as e:
+            result["error"] = str(e)
+            return result
+        result["latency"] = time.perf_counter() - started
+        result["statusCode"] = response.status_code
         headersReceived = response.headers
         if self.debug:
             pprint('response headers')
             pprint(headersReceived)
         if 'x-sw-status' in headersReceived:
-            print("SpeedWorkers Status:"+headersReceived["x-sw-status"])
-            if 'x-sw-echo' in headersReceived:
-                if headersReceived['x-sw-echo'] == randomNumber:
+            result["swStatus"] = headersReceived["x-sw-status"]
+            result["echoReceived"] = headersReceived.get('x-sw-echo')
+            result["echo"] = result["echoReceived"] == randomNumber
+        return result
+
+    def checkConnectionEcho(self, url, userAgent="botify-bot-sw-test"):
+        result = self._echoCheck(url, userAgent)
+        if result["error"]:
+            print(result["error"])
+            return False
+        if result["swStatus"] is not None:
+            print("SpeedWorkers Status:"+result["swStatus"])
+            if result["echoReceived"] is not None:
+                if result["echo"]:
                     print("Echo Successful")
                     return True
                 else:
                     print("Wrong Echo Number")
-                    print("Echo sent:{0}".format(randomNumber))
-                    print("Echo received:" + headersReceived['x-sw-echo'])
+                    print("Echo sent:{0}".format(result["echoSent"]))
+                    print("Echo received:" + result["echoReceived"])
                     return False
             else:
                 print("No echo found")
                 return False
         return False
 
+    @staticmethod
+    def _percentile(sortedValues, percent):
+        if not sortedValues:
+            return None
+        # Nearest-rank percentile
+        index = max(math.ceil(percent / 100 * len(sortedValues)) - 1, 0)
+        return sortedValues[index]
+
+    def checkConnectionEchoBulk(self, urls, userAgents=("botify-bot-sw-test",), concurrency=16):
+        checks = [(url.strip(), userAgent) for url in urls if url and url.strip() for userAgent in userAgents]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda check: self._echoCheck(*check), checks))
+
+        latencies = sorted(result["latency"] for result in results if result["latency"] is not None)
+        statusBreakdown = defaultdict(Counter)
+        for result in results:
+            status = result["swStatus"] or ("error" if result["error"] else "missing")
+            statusBreakdown[result["userAgent"]][status] += 1
+        summary = {
+            "checks": len(results),
+            "echoOk": sum(1 for result in results if result["echo"]),
+            "errors": sum(1 for result in results if result["error"]),
+            "latency": {
+                "p50": self._percentile(latencies, 50),
+                "p90": self._percentile(latencies, 90),
+                "p95": self._percentile(latencies, 95),
+                "p99": self._percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None
+            },
+            "swStatus": dict(sum(statusBreakdown.values(), Counter())),
+            "swStatusByUserAgent": {userAgent: dict(counts) for userAgent, counts in statusBreakdown.items()}
+        }
+        if self.debug:
+            pprint(summary)
+        return {"summary": summary, "results": results}
+
     def _checkConnection(self, url, headerOption, expectedResult, userAgent="botify-bot-sw-test"):
-        headers=self.deliveryHeaders
+        headers=dict(self.deliveryHeaders)
         headers["X-Sw-Options"] = headerOption
         headers["User-Agent"] = userAgent
         randomNumber=42
@@ -370,7 +681,7 @@ class SpeedWorkersAPI:
 
     def speedWorkerInventory(self, urls, operations, refreshPriority, device):
         #targetUrl = "https://{0}.api.speedworkers.com/inventory".format(self.clusterId)
-        targetUrl = "https://api.{0}.speedworkers.com/inventory".format(self.clusterId)
+        targetUrl = self.inventoryUrl or "https://api.{0}.speedworkers.com/inventory".format(self.clusterId)
         ##Warning to check if the documentaion has evolved with "https://api.[CLUSTER-ID].speedworker.com/inventory" or not
         headers = self.inventoryHeaders
         ##use of json.dumps to replace " instead of '
@@ -392,27 +703,17 @@ class SpeedWorkersAPI:
             print(response)
         return response
 
-    def refreshPages(self, UrlPages, refreshPriority="low", device="na"):
-        numberOfPages = len(UrlPages)
-        maxUrlPerBatch = 999
-        maxBatch = round(numberOfPages/maxUrlPerBatch)
-        if self.debug:
-            pprint('Number of URLs : {0}'.format(numberOfPages))
-            pprint('Number of Batch : {0}'.format(maxBatch))
-
-        myTodo = list(self.divide_chunks(UrlPages, maxUrlPerBatch))
-        i=1
-        for curList in myTodo:
-            print("Batch {0} / {1}".format(i,maxBatch))
-            jsonRes = self.speedWorkerInventory(curList,'["REFRESH"]', refreshPriority, device)
-            if jsonRes:
-                if "message" in jsonRes:
-                    print(jsonRes["message"])
-                else:
-                    print('No Message')
-            else:
-                print("Error during Post")
-            #pprint(curList)
-            ## Wait 1 minute between each batch (cf : https://developers.botify.com/docs/inventory-management-api)
-            time.sleep(60)
-            i+=1
\ No newline at end of file
+    def refreshScheduler(self, statePath=None, window=60):
+        ## The inventory quota is refilled every minute (cf : https://developers.botify.com/docs/inventory-management-api)
+        return RefreshScheduler(self, state_path=statePath, window=window)
+
+    def refreshPages(self, UrlPages, refreshPriority="low", device="na", statePath=None, progress_callback=None):
+        scheduler = self.refreshScheduler(statePath)
+        task = scheduler.add(UrlPages, refreshPriority, device)
+        if self.debug:
+            pprint('Number of URLs : {0}'.format(len(task.urls)))
+            pprint('Number of Batch : {0}'.format(scheduler.total_batches_left(task, 0)))
+        results = scheduler.run(progress_callback)
+        if self.debug:
+            pprint(results)
+        return results
\ No newline at end of file
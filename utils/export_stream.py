@@ -0,0 +1,200 @@
+# This Python file uses the following encoding: utf-8
+import csv
+import gzip
+import hashlib
+import io
+import os
+import requests
+from urllib3.exceptions import HTTPError
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class ChecksumError(ValueError):
+    pass
+
+
+class ResumableDownload(io.RawIOBase):
+    """Flux binaire sur une URL distante qui reprend avec un header Range en cas de coupure.
+
+    Si `spill_path` est fourni, les octets reçus sont aussi écrits sur disque et un
+    fichier partiel existant est relu avant de reprendre le téléchargement à sa fin.
+    """
+
+    def __init__(self, transport, url, spill_path=None, checksum=None, max_resumes=5):
+        super().__init__()
+        self.transport = transport
+        self.url = url
+        self.spill_path = spill_path
+        self.max_resumes = max_resumes
+        self.resumes = 0
+        self.offset = 0
+        self.total_size = None
+        self.algorithm, self.expected_digest = self._parse_checksum(checksum)
+        self.hash = hashlib.new(self.algorithm) if self.expected_digest else None
+        self._response = None
+        self._local = None
+        self._spill = None
+        self._eof = False
+        if spill_path:
+            if os.path.exists(spill_path):
+                self._local = open(spill_path, 'rb')
+            self._spill = open(spill_path, 'ab')
+
+    @staticmethod
+    def _parse_checksum(checksum):
+        if not checksum:
+            return "md5", None
+        if ":" in checksum:
+            algorithm, digest = checksum.split(":", 1)
+            return algorithm.lower(), digest.lower()
+        return "md5", checksum.lower()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._eof:
+            return 0
+        size = len(buffer)
+        data = self._read_local(size) if self._local else b""
+        while not data:
+            data = self._read_remote(size)
+            if data is None:
+                self._finish()
+                return 0
+        buffer[:len(data)] = data
+        self._consume(data, spill=self._local is None)
+        return len(data)
+
+    def _read_local(self, size):
+        data = self._local.read(size)
+        if not data:
+            self._local.close()
+            self._local = None
+        return data
+
+    def _read_remote(self, size):
+        if self._response is None:
+            self._open_remote()
+            if self._response is None:
+                return None
+        try:
+            data = self._response.raw.read(size, decode_content=False)
+        except (requests.exceptions.RequestException, HTTPError, OSError):
+            self._resume()
+            return b""
+        if not data:
+            if self.total_size is not None and self.offset < self.total_size:
+                # Connection closed before the end of the file
+                self._resume()
+                return b""
+            return None
+        return data
+
+    def _open_remote(self):
+        headers = {"Range": "bytes={0}-".format(self.offset)} if self.offset else {}
+        response = self.transport.get(self.url, headers=headers, stream=True)
+        if response.status_code == 416:
+            # The spill file already holds the whole export
+            response.close()
+            return
+        response.raise_for_status()
+        if self.offset and response.status_code != 206:
+            # Range ignored by the server, skip what we already have
+            self._skip(response, self.offset)
+        self._response = response
+        if self.total_size is None:
+            content_range = response.headers.get("Content-Range", "")
+            if "/" in content_range and not content_range.endswith("*"):
+                self.total_size = int(content_range.rsplit("/", 1)[1])
+            elif response.status_code == 200 and response.headers.get("Content-Length"):
+                self.total_size = int(response.headers["Content-Length"])
+
+    def _skip(self, response, count):
+        while count:
+            data = response.raw.read(min(count, 1024 * 1024), decode_content=False)
+            if not data:
+                raise IOError("Export is shorter than the data already downloaded")
+            count -= len(data)
+
+    def _resume(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        self.resumes += 1
+        if self.resumes > self.max_resumes:
+            raise IOError("Download of {0} interrupted {1} times".format(self.url, self.resumes))
+
+    def _consume(self, data, spill):
+        self.offset += len(data)
+        if self.hash:
+            self.hash.update(data)
+        if spill and self._spill:
+            self._spill.write(data)
+
+    def _finish(self):
+        self._eof = True
+        self._release()
+        if self.hash and self.hash.hexdigest() != self.expected_digest:
+            raise ChecksumError("{0} checksum mismatch for {1}: expected {2}, got {3}".format(
+                self.algorithm, self.url, self.expected_digest, self.hash.hexdigest()))
+
+    def close(self):
+        self._release()
+        super().close()
+
+    def _release(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        if self._local:
+            self._local.close()
+            self._local = None
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+
+
+def open_export(transport, url, spill_path=None, checksum=None, encoding='utf-8'):
+    """Renvoie un flux texte décompressé à la volée sur un export Botify"""
+    raw = ResumableDownload(transport, url, spill_path=spill_path, checksum=checksum)
+    stream = io.BufferedReader(raw, buffer_size=1024 * 1024)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding=encoding, newline='')
+
+
+def _read_separator(text_stream):
+    # Botify exports may start with an Excel "sep=," line
+    line = text_stream.readline()
+    if line.startswith("sep="):
+        return line[4:5] or ",", text_stream.readline()
+    return ",", line
+
+
+def iter_export_rows(transport, url, spill_path=None, checksum=None, encoding='utf-8'):
+    with open_export(transport, url, spill_path, checksum, encoding) as text_stream:
+        separator, header = _read_separator(text_stream)
+        if not header:
+            return
+        yield next(csv.reader([header], delimiter=separator))
+        yield from csv.reader(text_stream, delimiter=separator)
+        # Reach the end of the download so the checksum gets verified
+        text_stream.read()
+
+
+def iter_export_chunks(transport, url, spill_path=None, checksum=None, encoding='utf-8',
+                       chunksize=100000, usecols=None):
+    import pandas as pd
+
+    with open_export(transport, url, spill_path, checksum, encoding) as text_stream:
+        separator, header = _read_separator(text_stream)
+        if not header:
+            return
+        columns = next(csv.reader([header], delimiter=separator))
+        reader = pd.read_csv(text_stream, sep=separator, header=None, names=columns,
+                             usecols=usecols, chunksize=chunksize)
+        for chunk in reader:
+            yield chunk
+        text_stream.read()
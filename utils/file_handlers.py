@@ -1,39 +1,405 @@
 # This Python file uses the following encoding: utf-8
 import zipfile
+import gzip
 import io
+import os
 import csv
-from collections import defaultdict
+import multiprocessing
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait
+import pandas as pd
+
+try:
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa_csv = None
+
+
+InputPart = namedtuple("InputPart", ["path", "member", "size"])
+# A whole part (start is None), or a byte range of an uncompressed file read after `prefix` (the header lines)
+Shard = namedtuple("Shard", ["part", "start", "end", "prefix"])
+
+# Members of an archive that hold data, the other files (readme.txt, __MACOSX...) are ignored
+DATA_EXTENSIONS = (".csv", ".csv.gz")
+UTF8_BOM = b"\xef\xbb\xbf"
+BUFFER_SIZE = 1024 * 1024
+
+
+class ByteProgress:
+    """Pourcentage d'octets lus, partagé par tous les fichiers d'une même lecture"""
+
+    def __init__(self, total, progress_callback=None):
+        self.total = total
+        self.progress_callback = progress_callback
+        self.bytes_read = 0
+        self._last_progress = -1
+
+    def add(self, count):
+        self.bytes_read += count
+        if not self.progress_callback or not self.total:
+            return
+        progress = min(int(self.bytes_read * 100 / self.total), 100)
+        if progress != self._last_progress:
+            self._last_progress = progress
+            self.progress_callback(progress)
+
+
+class SharedProgress:
+    """Octets lus par les processus d'un pool, cumulés dans une multiprocessing.Value"""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def add(self, count):
+        with self.counter.get_lock():
+            self.counter.value += count
+
+
+class ProgressReader(io.RawIOBase):
+    """Flux binaire qui rapporte la progression d'après les octets lus (une seule lecture du fichier)"""
+
+    def __init__(self, raw, total=None, progress_callback=None, closing=(), progress=None):
+        self.raw = raw
+        self.progress = progress or ByteProgress(total, progress_callback)
+        self.closing = closing
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            self.progress.add(count)
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+            for resource in self.closing:
+                resource.close()
+        super().close()
+
+
+class MultiPartReader(io.RawIOBase):
+    """Enchaîne plusieurs fichiers CSV en un seul flux.
+
+    Le préambule `sep=` et l'en-tête des fichiers suivants sont sautés, seul celui du
+    premier fichier est conservé. Un fichier dont l'en-tête diffère du premier lève
+    une ValueError plutôt que d'être lu avec les mauvaises colonnes.
+    """
+
+    def __init__(self, openers, closing=()):
+        self._openers = iter(openers)
+        self.closing = closing
+        self._current = None
+        self._index = 0
+        self._header = None
+        self._prefix = b""
+        self._last_byte = None
+        self._pending_newline = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self._current is None:
+                if self._pending_newline:
+                    # A part without a final newline must not glue its last row to the next one
+                    self._pending_newline = False
+                    self._last_byte = ord("\n")
+                    buffer[0:1] = b"\n"
+                    return 1
+                opener = next(self._openers, None)
+                if opener is None:
+                    return 0
+                self._current = opener()
+                lines = self._read_header(self._current)
+                if not self._index:
+                    # The header of the first part is read back before its rows
+                    self._header = self._header_key(lines)
+                    self._prefix = lines
+                elif lines and self._header_key(lines) != self._header:
+                    raise ValueError(f"Part {self._index + 1} does not have the same header as the first part")
+                self._index += 1
+            if self._prefix:
+                count = min(len(buffer), len(self._prefix))
+                buffer[:count] = self._prefix[:count]
+                self._prefix = self._prefix[count:]
+                self._last_byte = buffer[count - 1]
+                return count
+            count = self._current.readinto(buffer)
+            if count:
+                self._last_byte = buffer[count - 1]
+                return count
+            self._current.close()
+            self._current = None
+            self._pending_newline = self._last_byte not in (None, ord("\n"))
+
+    @staticmethod
+    def _read_header(stream):
+        lines = stream.readline()
+        if lines.lstrip(UTF8_BOM).startswith(b"sep="):
+            lines += stream.readline()
+        return lines
+
+    @staticmethod
+    def _header_key(lines):
+        return [line.strip() for line in lines.lstrip(UTF8_BOM).splitlines()]
+
+    def close(self):
+        if not self.closed:
+            if self._current is not None:
+                self._current.close()
+            for resource in self.closing:
+                resource.close()
+        super().close()
+
+
+class RangeReader(io.RawIOBase):
+    """Lit `prefix` puis les octets [start, end) d'un fichier"""
+
+    def __init__(self, path, start, end, prefix=b""):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+        self.prefix = prefix
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix:
+            count = min(len(buffer), len(self.prefix))
+            buffer[:count] = self.prefix[:count]
+            self.prefix = self.prefix[count:]
+            return count
+        if self.remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:min(len(buffer), self.remaining)]
+        count = self.file.readinto(view)
+        self.remaining -= count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+
+_shard_progress = None
+
+
+def _init_shard_worker(counter):
+    global _shard_progress
+    _shard_progress = SharedProgress(counter)
+
+
+def _run_shard(function, shard):
+    with FileHandler.open_shard(shard, _shard_progress) as stream:
+        return function(stream)
+
 
 class FileHandler:
     @staticmethod
     def open_file(file_path):
-        if file_path.endswith(".zip"):
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                file_bytes = zip_ref.open(zip_ref.namelist()[0])
-                return io.TextIOWrapper(file_bytes, encoding='utf-8')
+        return FileHandler.open_stream(file_path)
+
+    @staticmethod
+    def input_parts(file_paths):
+        """Liste les fichiers de données : chaque CSV d'un zip, les .gz et .csv donnés directement"""
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        parts = []
+        for path in file_paths:
+            if not path.endswith(".zip"):
+                parts.append(InputPart(path, None, os.path.getsize(path)))
+                continue
+            with zipfile.ZipFile(path, 'r') as zip_ref:
+                members = [info for info in zip_ref.infolist()
+                           if not info.is_dir() and not info.filename.startswith("__MACOSX/")]
+                data = [info for info in members if info.filename.lower().endswith(DATA_EXTENSIONS)]
+                if not data:
+                    raise ValueError(f"No CSV file in {path}")
+                # Exports are split as part1, part2...: the name order is the row order
+                for info in sorted(data, key=lambda info: info.filename):
+                    parts.append(InputPart(path, info.filename, info.file_size))
+        return parts
+
+    @staticmethod
+    def open_part(part, progress=None, zip_ref=None):
+        name = part.member or part.path
+        if part.member is None:
+            raw = ProgressReader(open(part.path, 'rb'), progress=progress)
+        elif zip_ref is not None:
+            raw = ProgressReader(zip_ref.open(part.member), progress=progress)
         else:
-            return open(file_path, 'r')
+            zip_ref = zipfile.ZipFile(part.path, 'r')
+            raw = ProgressReader(zip_ref.open(part.member), progress=progress, closing=(zip_ref,))
+        stream = io.BufferedReader(raw, buffer_size=BUFFER_SIZE)
+        if name.lower().endswith(".gz"):
+            # Progress follows the compressed offset, GzipFile does not close the file it wraps
+            raw = ProgressReader(gzip.GzipFile(fileobj=stream, mode='rb'), closing=(stream,))
+            return io.BufferedReader(raw, buffer_size=BUFFER_SIZE)
+        return stream
+
+    @staticmethod
+    def open_binary(file_paths, progress_callback=None):
+        """Ouvre un ou plusieurs fichiers (zip multi-parties, .gz, .csv) comme un seul flux binaire.
+
+        La progression suit les octets lus : taille décompressée des membres d'un zip,
+        taille compressée d'un .gz.
+        """
+        parts = FileHandler.input_parts(file_paths)
+        progress = ByteProgress(sum(part.size for part in parts), progress_callback)
+        # The archives stay open until the stream is closed
+        archives = {path: zipfile.ZipFile(path, 'r') for path in {part.path for part in parts if part.member}}
+        openers = [
+            lambda part=part: FileHandler.open_part(part, progress, archives.get(part.path))
+            for part in parts
+        ]
+        return io.BufferedReader(MultiPartReader(openers, closing=list(archives.values())), buffer_size=BUFFER_SIZE)
+
+    @staticmethod
+    def shards(file_paths, count):
+        """Découpe l'entrée pour un traitement parallèle.
+
+        Plusieurs fichiers de données : un shard par fichier. Un seul CSV non compressé :
+        `count` plages d'octets alignées sur les fins de ligne, chacune précédée de l'en-tête.
+        Un zip ou .gz d'un seul membre ne peut pas être découpé sans le décompresser.
+        """
+        parts = FileHandler.input_parts(file_paths)
+        if len(parts) > 1 or count < 2:
+            return [Shard(part, None, None, b"") for part in parts]
+        part = parts[0]
+        if part.member is not None or part.path.lower().endswith(".gz"):
+            return [Shard(part, None, None, b"")]
+
+        with open(part.path, 'rb') as f:
+            prefix = f.readline()
+            if prefix.startswith(b"sep="):
+                prefix += f.readline()
+            # Make sure the header ends the prefix even in an empty file
+            if not prefix.endswith(b"\n"):
+                prefix += b"\n"
+            bounds = [f.tell()]
+            for index in range(1, count):
+                f.seek(bounds[0] + (part.size - bounds[0]) * index // count)
+                f.readline()
+                if bounds[-1] < f.tell() < part.size:
+                    bounds.append(f.tell())
+        bounds.append(part.size)
+        return [Shard(part, start, end, prefix) for start, end in zip(bounds, bounds[1:])]
+
+    @staticmethod
+    def shard_size(shard):
+        return shard.part.size if shard.start is None else shard.end - shard.start
+
+    @staticmethod
+    def open_shard(shard, progress=None):
+        if shard.start is None:
+            return FileHandler.open_part(shard.part, progress)
+        raw = RangeReader(shard.part.path, shard.start, shard.end, shard.prefix)
+        if progress is not None:
+            raw = ProgressReader(raw, progress=progress)
+        return io.BufferedReader(raw, buffer_size=BUFFER_SIZE)
+
+    @staticmethod
+    def map_shards(shards, function, merge=None, processes=None, progress_callback=None):
+        """Applique `function` à chaque shard dans un pool de processus.
+
+        `function` (une fonction de module, ou un functools.partial) reçoit le flux binaire
+        du shard, préambule et en-tête compris. Les résultats sont renvoyés dans l'ordre des
+        shards, ou passés à `merge` ; la progression suit les octets lus par tous les processus.
+        Les processus sont lancés en `spawn` : un fork depuis le thread d'une appli Qt n'est pas sûr.
+        """
+        progress = ByteProgress(sum(FileHandler.shard_size(shard) for shard in shards), progress_callback)
+        results = [None] * len(shards)
+        context = multiprocessing.get_context("spawn")
+        counter = context.Value('q', 0)
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_shard_worker,
+                                 initargs=(counter,)) as executor:
+            futures = {executor.submit(_run_shard, function, shard): index for index, shard in enumerate(shards)}
+            running = set(futures)
+            while running:
+                done, running = wait(running, timeout=0.5)
+                for future in done:
+                    results[futures[future]] = future.result()
+                progress.add(counter.value - progress.bytes_read)
+        return merge(results) if merge else results
+
+    @staticmethod
+    def map_members(file_paths, function, merge=None, processes=None, progress_callback=None):
+        """Applique `function` à chaque fichier de données (membre de zip, .gz, .csv) dans un pool de processus"""
+        shards = [Shard(part, None, None, b"") for part in FileHandler.input_parts(file_paths)]
+        return FileHandler.map_shards(shards, function, merge, processes, progress_callback)
+
+    @staticmethod
+    def open_stream(file_paths, progress_callback=None, encoding='utf-8'):
+        return io.TextIOWrapper(FileHandler.open_binary(file_paths, progress_callback), encoding=encoding, newline='')
+
+    @staticmethod
+    def read_separator(stream, default=','):
+        """Consomme la ligne `sep=;` des exports Botify si elle est présente et renvoie le séparateur"""
+        if stream.peek(4)[:4] != b"sep=":
+            return default
+        separator = stream.readline()[4:].strip().decode('utf-8')
+        return separator or default
+
+    @staticmethod
+    def read_csv_chunks(file_paths, usecols=None, dtype=None, chunksize=500000, engine=None, progress_callback=None):
+        """Lit un export CSV (zip, gz ou brut, en une ou plusieurs parties) par DataFrames de `chunksize` lignes environ.
+
+        Seules les colonnes `usecols` sont décodées. Le moteur pyarrow est utilisé s'il est
+        installé (`engine="pyarrow"`), sinon le moteur C de pandas (`engine="c"`). Seule une
+        cellule vide est une valeur manquante : un mot-clé "null" ou "NA" reste du texte.
+        """
+        with FileHandler.open_binary(file_paths, progress_callback) as stream:
+            yield from FileHandler.read_stream_chunks(stream, usecols, dtype, chunksize, engine)
+
+    @staticmethod
+    def read_stream_chunks(stream, usecols=None, dtype=None, chunksize=500000, engine=None):
+        """Comme read_csv_chunks, sur un flux binaire déjà ouvert (préambule `sep=` compris)"""
+        if engine is None:
+            engine = "pyarrow" if pa_csv is not None else "c"
+        separator = FileHandler.read_separator(stream)
+        if engine == "pyarrow":
+            yield from FileHandler._arrow_chunks(stream, separator, usecols, dtype, chunksize)
+        else:
+            # Same as the csv module and arrow string columns: "NA", "null", "nan"... are kept as written
+            yield from pd.read_csv(stream, sep=separator, usecols=usecols, dtype=dtype, chunksize=chunksize,
+                                   engine="c", encoding='utf-8', keep_default_na=False, na_values=[''])
+
+    @staticmethod
+    def _arrow_chunks(stream, separator, usecols, dtype, chunksize):
+        import pyarrow as pa
+
+        reader = pa_csv.open_csv(
+            stream,
+            read_options=pa_csv.ReadOptions(block_size=16 * 1024 * 1024),
+            parse_options=pa_csv.ParseOptions(delimiter=separator),
+            convert_options=pa_csv.ConvertOptions(include_columns=list(usecols) if usecols else None,
+                                                  column_types=dtype)
+        )
+        # Arrow batches are sized in bytes, they are regrouped to get about `chunksize` rows
+        batches, rows = [], 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= chunksize:
+                yield pa.Table.from_batches(batches).to_pandas()
+                batches, rows = [], 0
+        if batches:
+            yield pa.Table.from_batches(batches).to_pandas()
 
     @staticmethod
     def extract_query_params_from_file(file_path, progress_callback=None):
-        with FileHandler.open_file(file_path) as csvfile:
+        with FileHandler.open_stream(file_path, progress_callback) as csvfile:
             reader = csv.reader(csvfile, delimiter=',')
             # Skip the first two lines
             next(reader) #sep=,
             next(reader) #header
-            urls = []
-
-            # Lire le fichier une première fois pour compter le nombre total de lignes
-            total_rows = sum(1 for _ in reader)
-            csvfile.seek(0)  # Retourner au début du fichier
-            next(reader)  # Skip sep=,
-            next(reader)  # Skip header
-
-            for i, row in enumerate(reader, 1):
-                urls.append(row[0])
-                if progress_callback:
-                    progress = int((i / total_rows) * 100)
-                    progress_callback(progress)
+            urls = [row[0] for row in reader]
 
         return urls
 
@@ -0,0 +1,112 @@
+# This Python file uses the following encoding: utf-8
+from collections import Counter, defaultdict, namedtuple
+
+Violation = namedtuple("Violation", ["type", "url", "target", "lang", "detail"])
+
+MISSING_RETURN_LINK = "missing_return_link"
+CONFLICTING_LANGUAGE = "conflicting_language"
+TARGET_SEVERAL_LANGUAGES = "target_several_languages"
+LANGUAGE_MISMATCH = "language_mismatch"
+MISSING_SELF_REFERENCE = "missing_self_reference"
+MISSING_X_DEFAULT = "missing_x_default"
+TARGET_NOT_IN_SITEMAP = "target_not_in_sitemap"
+
+
+class HreflangValidator:
+    """Vérifie la cohérence des clusters hreflang d'un sitemap en temps linéaire.
+
+    Les URLs sont converties en entiers puis indexées (url -> [(lang, cible)]), chaque
+    contrôle de réciprocité est donc une simple recherche dans un set.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._urls = []
+        self._listed = set()
+        self._alternates = defaultdict(list)
+
+    def _id(self, url):
+        url_id = self._ids.get(url)
+        if url_id is None:
+            url_id = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+        return url_id
+
+    def add(self, url, hreflang_url, lang):
+        page = self._id(url)
+        self._listed.add(page)
+        if hreflang_url:
+            self._alternates[page].append(((lang or "").lower(), self._id(hreflang_url)))
+
+    def add_records(self, records):
+        for url, hreflang_url, lang, *_ in records:
+            self.add(url, hreflang_url, lang)
+        return self
+
+    @classmethod
+    def from_frame(cls, frame):
+        validator = cls()
+        columns = frame[["URL", "hreflang URL", "hreflang"]].astype(str)
+        return validator.add_records(columns.itertuples(index=False, name=None))
+
+    def validate(self):
+        urls = self._urls
+        # Set of targets per page, built once: every return-link check is then O(1)
+        targets_by_page = {page: {target for _, target in links} for page, links in self._alternates.items()}
+        self_languages = defaultdict(set)
+        for page, links in self._alternates.items():
+            for lang, target in links:
+                if target == page:
+                    self_languages[page].add(lang)
+
+        for page, links in self._alternates.items():
+            url = urls[page]
+            languages = defaultdict(set)
+            target_languages = defaultdict(set)
+            for lang, target in links:
+                languages[lang].add(target)
+                target_languages[target].add(lang)
+
+            for lang, targets in languages.items():
+                if len(targets) > 1:
+                    for target in sorted(targets):
+                        yield Violation(CONFLICTING_LANGUAGE, url, urls[target], lang,
+                                        f"{len(targets)} different URLs declared for {lang}")
+            for target, target_langs in target_languages.items():
+                if len(target_langs - {"x-default"}) > 1:
+                    yield Violation(TARGET_SEVERAL_LANGUAGES, url, urls[target], ",".join(sorted(target_langs)),
+                                    "Same URL declared for several languages")
+            if page not in target_languages:
+                yield Violation(MISSING_SELF_REFERENCE, url, "", "", "Page does not reference itself")
+            if "x-default" not in languages:
+                yield Violation(MISSING_X_DEFAULT, url, "", "", "No x-default alternate")
+
+            for lang, target in links:
+                if target == page:
+                    continue
+                if target not in self._listed:
+                    yield Violation(TARGET_NOT_IN_SITEMAP, url, urls[target], lang, "Alternate URL not listed in the sitemaps")
+                    continue
+                if page not in targets_by_page.get(target, ()):
+                    yield Violation(MISSING_RETURN_LINK, url, urls[target], lang,
+                                    "Alternate URL does not link back")
+                    continue
+                declared = self_languages.get(target)
+                if lang != "x-default" and declared and lang not in declared:
+                    yield Violation(LANGUAGE_MISMATCH, url, urls[target], lang,
+                                    "Alternate URL declares itself as " + ",".join(sorted(declared)))
+
+    def report(self):
+        violations = list(self.validate())
+        return {
+            "pages": len(self._listed),
+            "pages_with_hreflang": len(self._alternates),
+            "links": sum(len(links) for links in self._alternates.values()),
+            "violations": dict(Counter(violation.type for violation in violations)),
+            "details": violations
+        }
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame.from_records(self.validate(), columns=Violation._fields)
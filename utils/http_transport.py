@@ -0,0 +1,177 @@
+# This Python file uses the following encoding: utf-8
+import threading
+import time
+import requests
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from utils.rate_limiter import get_limiter, parse_retry_after
+
+
+class TransportStats:
+    """Compteurs partagés entre toutes les connexions d'un transport"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.handshakes = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_handshake(self):
+        with self._lock:
+            self.handshakes += 1
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.handshakes = 0
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "handshakes": self.handshakes,
+                "reused": max(self.requests - self.handshakes, 0)
+            }
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        # A new connection in a pool means a new TCP (+TLS) handshake
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                stats.count_handshake()
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                stats.count_handshake()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.count_request()
+        return super().send(request, **kwargs)
+
+
+class PooledTransport:
+    # 429 is handled in request() so that the wait is shared through the rate limiter
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, pool_connections=10, pool_maxsize=20, max_retries=3,
+                 backoff_factor=0.5, timeout=(5, 60), retry_status=RETRY_STATUS, rate_limited=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_limited = rate_limited
+        self.stats = TransportStats()
+        self.retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_status,
+            allowed_methods=None,  # BQL queries are POST requests, retry them too (see retry=False)
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.session = requests.Session()
+        adapter = CountingHTTPAdapter(
+            self.stats,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=self.retry,
+            pool_block=True
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._single_session = None
+        self._single_session_lock = threading.Lock()
+
+    def _get_single_session(self):
+        # Same stats, no urllib3 retries: for requests that must not be sent twice
+        with self._single_session_lock:
+            if self._single_session is None:
+                session = requests.Session()
+                adapter = CountingHTTPAdapter(self.stats, pool_connections=1, pool_maxsize=self.pool_maxsize,
+                                              max_retries=0, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._single_session = session
+            return self._single_session
+
+    def request(self, method, url, retry=True, **kwargs):
+        """`retry=False` for non-idempotent calls (job creation...): a 5xx or a broken connection
+        is not retried, the request may have been processed. A 429 is still retried."""
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session if retry else self._get_single_session()
+        limiter = get_limiter(urlparse(url).hostname) if self.rate_limited else None
+        attempt = 0
+        while True:
+            if limiter:
+                limiter.acquire()
+            response = session.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = self.backoff_factor * (2 ** attempt)
+            response.close()
+            if limiter:
+                limiter.block_for(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self):
+        return self.stats.as_dict()
+
+    def close(self):
+        self.session.close()
+        with self._single_session_lock:
+            if self._single_session is not None:
+                self._single_session.close()
+                self._single_session = None
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = PooledTransport()
+        return _default_transport
+
+
+def configure_default_transport(**kwargs):
+    """Remplace le transport partagé par un nouveau transport configuré"""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is not None:
+            _default_transport.close()
+        _default_transport = PooledTransport(**kwargs)
+        return _default_transport
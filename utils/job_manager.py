@@ -0,0 +1,124 @@
+# This Python file uses the following encoding: utf-8
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+
+class JobTimeoutError(Exception):
+    pass
+
+
+class _Job:
+    def __init__(self, check, future, delay, deadline):
+        self.check = check
+        self.future = future
+        self.delay = delay
+        self.deadline = deadline
+        self.attempts = 0
+
+
+class JobManager:
+    """Surveille plusieurs jobs asynchrones depuis une seule boucle de polling.
+
+    `check` est appelé jusqu'à ce qu'il renvoie une valeur vraie (résultat du job)
+    ou lève une exception (job en échec). L'intervalle entre deux vérifications
+    d'un même job part de `initial_delay` et augmente jusqu'à `max_delay`.
+    """
+
+    def __init__(self, initial_delay=1, max_delay=30, backoff=1.5, timeout=None):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.timeout = timeout
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, check, callback=None, timeout=None):
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        job = _Job(check, future, self.initial_delay, deadline)
+        future.set_running_or_notify_cancel()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("JobManager has been shut down")
+            self._schedule(job, time.monotonic())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="JobManager", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def pending(self):
+        with self._condition:
+            return len(self._queue)
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            for _, _, job in self._queue:
+                job.future.set_exception(JobTimeoutError("JobManager shut down"))
+            self._queue = []
+            self._condition.notify()
+
+    def _schedule(self, job, when):
+        heapq.heappush(self._queue, (when, next(self._counter), job))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._queue:
+                        # Nothing left to watch, a new thread is started by the next submit
+                        self._thread = None
+                        return
+                    when = self._queue[0][0]
+                    now = time.monotonic()
+                    if when <= now:
+                        break
+                    self._condition.wait(when - now)
+                _, _, job = heapq.heappop(self._queue)
+            self._poll(job)
+
+    def _poll(self, job):
+        job.attempts += 1
+        try:
+            result = job.check()
+        except Exception as e:
+            job.future.set_exception(e)
+            return
+        if result:
+            job.future.set_result(result)
+            return
+        now = time.monotonic()
+        if job.deadline is not None and now >= job.deadline:
+            job.future.set_exception(JobTimeoutError("Job still running after {0} checks".format(job.attempts)))
+            return
+        when = now + job.delay
+        if job.deadline is not None:
+            when = min(when, job.deadline)
+        job.delay = min(job.delay * self.backoff, self.max_delay)
+        with self._condition:
+            if self._stopped:
+                job.future.set_exception(JobTimeoutError("JobManager shut down"))
+            else:
+                self._schedule(job, when)
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_default_job_manager():
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = JobManager()
+        return _default_manager
@@ -0,0 +1,188 @@
+# This Python file uses the following encoding: utf-8
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from utils.file_handlers import FileHandler
+from utils.keyword_tokenizer import get_tokenizer
+from utils.text_analysis import TextAnalyzer
+
+STATS_COLUMNS = ['occurrences', 'total_clicks', 'total_impressions']
+
+
+def file_fingerprint(file_path, sample_size=1024 * 1024):
+    # Size and both ends of the file: cheap on multi-GB exports, enough to spot a new export
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(size - sample_size, sample_size))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class KeywordStatsStore:
+    """Stats par mot et par période (jour), conservées dans sqlite entre deux analyses.
+
+    Un fichier déjà ingéré est ignoré, mais seulement s'il est identique (même empreinte) :
+    un export cumulatif mis à jour est un nouveau fichier. Avec `date_column`, seules les
+    lignes postérieures à la dernière date vue pour la source sont ajoutées, l'export
+    n'est donc jamais retraité ; sans, une source ne peut être ingérée qu'une fois.
+    Les jours sont supposés complets dans un export.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS word_stats ("
+                         "word TEXT, period TEXT, occurrences INTEGER, total_clicks INTEGER, "
+                         "total_impressions INTEGER, PRIMARY KEY (word, period))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS word_stats_period ON word_stats (period)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS files ("
+                         "fingerprint TEXT PRIMARY KEY, path TEXT, source TEXT, ingested_at REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, last_period TEXT)")
+        self._db.commit()
+
+    def _upsert(self, stats):
+        self._db.executemany(
+            "INSERT INTO word_stats VALUES (?, ?, ?, ?, ?) ON CONFLICT (word, period) DO UPDATE SET "
+            "occurrences = occurrences + excluded.occurrences, "
+            "total_clicks = total_clicks + excluded.total_clicks, "
+            "total_impressions = total_impressions + excluded.total_impressions",
+            ((word, period, int(occurrences), int(clicks), int(impressions))
+             for (word, period), (occurrences, clicks, impressions) in zip(stats.index, stats.values))
+        )
+
+    @staticmethod
+    def _aggregate(chunk, tokenizer, period, date_column, watermark):
+        if date_column:
+            dates = pd.to_datetime(chunk[date_column], errors='coerce').dt.strftime('%Y-%m-%d')
+            keep = dates.notna() & (dates > watermark) if watermark else dates.notna()
+            chunk, dates = chunk[keep], dates[keep]
+        words, clicks, impressions = TextAnalyzer.keyword_terms(chunk, tokenizer)
+        frame = pd.DataFrame({
+            'word': words.values,
+            'period': dates.loc[words.index].values if date_column else period,
+            'total_clicks': clicks.loc[words.index].values.astype('int64'),
+            'total_impressions': impressions.loc[words.index].values.astype('int64')
+        })
+        return frame.groupby(['word', 'period'], sort=False).agg(
+            occurrences=('word', 'size'),
+            total_clicks=('total_clicks', 'sum'),
+            total_impressions=('total_impressions', 'sum')
+        )
+
+    def ingest(self, file_path, period=None, date_column=None, source=None, language='english',
+               extra_stopwords=(), chunksize=500000, progress_callback=None):
+        """Ajoute un export au store, renvoie un résumé de ce qui a été ingéré.
+
+        Sans `date_column`, toutes les lignes sont rattachées à `period` (aujourd'hui par défaut)
+        et la source ne doit pas avoir déjà été ingérée (ValueError sinon).
+        """
+        fingerprint = file_fingerprint(file_path)
+        source = source or os.path.basename(file_path)
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM files WHERE fingerprint = ?", (fingerprint,)).fetchone():
+                return {"file": file_path, "skipped": True, "words": 0, "periods": []}
+            if not date_column and self._db.execute("SELECT 1 FROM files WHERE source = ?", (source,)).fetchone():
+                # Without dates there is no way to tell new rows from rows already counted
+                raise ValueError(f"Source '{source}' already ingested: pass date_column to add only new rows, "
+                                 f"or use another source name")
+            row = self._db.execute("SELECT last_period FROM sources WHERE source = ?", (source,)).fetchone()
+            watermark = row[0] if row and date_column else None
+
+            period = period or datetime.date.today().isoformat()
+            tokenizer = get_tokenizer(language, extra_stopwords)
+            usecols = TextAnalyzer.KEYWORD_COLUMNS + ([date_column] if date_column else [])
+            partials = [
+                self._aggregate(chunk, tokenizer, period, date_column, watermark)
+                for chunk in FileHandler.read_csv_chunks(file_path, usecols=usecols, dtype={'Keyword': 'str'},
+                                                         chunksize=chunksize, progress_callback=progress_callback)
+            ]
+            partials = [partial for partial in partials if len(partial)]
+            stats = pd.concat(partials).groupby(level=[0, 1], sort=False).sum() if partials else None
+
+            periods = []
+            if stats is not None:
+                self._upsert(stats[STATS_COLUMNS])
+                periods = sorted(set(stats.index.get_level_values(1)))
+                last_period = max([periods[-1]] + ([watermark] if watermark else []))
+                self._db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (source, last_period))
+            self._db.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (fingerprint, file_path, source, time.time()))
+            self._db.commit()
+        return {"file": file_path, "skipped": False, "words": 0 if stats is None else len(stats), "periods": periods}
+
+    def merge(self, other_db_path):
+        """Ajoute les stats d'un autre store, renvoie le nombre de fichiers ajoutés"""
+        with self._lock:
+            self._db.execute("ATTACH DATABASE ? AS other", (other_db_path,))
+            try:
+                # Stats are stored summed: a file known by both stores would be counted twice
+                shared = self._db.execute("SELECT COUNT(*) FROM other.files "
+                                          "WHERE fingerprint IN (SELECT fingerprint FROM files)").fetchone()[0]
+                if shared:
+                    raise ValueError(f"{shared} file(s) already ingested in both stores")
+                self._db.execute(
+                    "INSERT INTO word_stats SELECT word, period, occurrences, total_clicks, total_impressions "
+                    "FROM other.word_stats WHERE true ON CONFLICT (word, period) DO UPDATE SET "
+                    "occurrences = occurrences + excluded.occurrences, "
+                    "total_clicks = total_clicks + excluded.total_clicks, "
+                    "total_impressions = total_impressions + excluded.total_impressions"
+                )
+                added = self._db.execute("INSERT INTO files SELECT * FROM other.files").rowcount
+                self._db.execute("INSERT INTO sources SELECT * FROM other.sources WHERE true "
+                                 "ON CONFLICT (source) DO UPDATE SET "
+                                 "last_period = MAX(last_period, excluded.last_period)")
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            finally:
+                self._db.execute("DETACH DATABASE other")
+            return added
+
+    def periods(self):
+        row = self._db.execute("SELECT MIN(period), MAX(period) FROM word_stats").fetchone()
+        return row if row[0] is not None else (None, None)
+
+    def query(self, start=None, end=None):
+        """Stats agrégées sur [start, end] (dates ISO incluses), au format create_word_stats_dataframe"""
+        with self._lock:
+            stats = pd.read_sql_query(
+                "SELECT word, SUM(occurrences) AS occurrences, SUM(total_clicks) AS total_clicks, "
+                "SUM(total_impressions) AS total_impressions FROM word_stats "
+                "WHERE period >= ? AND period <= ? GROUP BY word",
+                self._db, params=(start or "", end or "9999-12-31"), index_col="word"
+            )
+        return TextAnalyzer.create_word_stats_dataframe(stats)
+
+    def compare_windows(self, days=28, end=None):
+        """Fenêtre des `days` derniers jours (jusqu'à `end`, la dernière période par défaut) contre la précédente"""
+        end = end or self.periods()[1]
+        if end is None:
+            return self.query()
+        end_date = datetime.date.fromisoformat(end)
+        start = (end_date - datetime.timedelta(days=days - 1)).isoformat()
+        previous_end = (end_date - datetime.timedelta(days=days)).isoformat()
+        previous_start = (end_date - datetime.timedelta(days=2 * days - 1)).isoformat()
+
+        current = self.query(start, end)
+        previous = self.query(previous_start, previous_end)
+        previous = previous[['Word', 'Occurrences', 'Total_Clicks', 'Total_Impressions']].rename(columns={
+            'Occurrences': 'Previous_Occurrences',
+            'Total_Clicks': 'Previous_Clicks',
+            'Total_Impressions': 'Previous_Impressions'
+        })
+        df = current.merge(previous, on='Word', how='left')
+        previous_columns = ['Previous_Occurrences', 'Previous_Clicks', 'Previous_Impressions']
+        df[previous_columns] = df[previous_columns].fillna(0).astype('int64')
+        df['Clicks_Change'] = df['Total_Clicks'] - df['Previous_Clicks']
+        return df
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,57 @@
+# This Python file uses the following encoding: utf-8
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import nltk
+from nltk.corpus import stopwords
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+
+def load_stopwords(language='english'):
+    try:
+        return stopwords.words(language)
+    except LookupError:
+        # All languages ship in the same 'stopwords' corpus
+        nltk.download('stopwords')
+        return stopwords.words(language)
+
+
+class KeywordTokenizer:
+    """Découpe les mots-clés en mots, sans les stopwords de la langue (et les mots ajoutés).
+
+    Construit une fois par langue via `get_tokenizer` : le corpus NLTK n'est lu qu'une fois
+    par processus. `language=None` garde tous les mots.
+    """
+
+    def __init__(self, language='english', extra_stopwords=()):
+        self.language = language
+        language_stopwords = load_stopwords(language) if language else ()
+        self.stop_words = frozenset(language_stopwords) | frozenset(word.lower() for word in extra_stopwords)
+        self.pattern = WORD_PATTERN
+
+    def tokenize(self, text):
+        # Same tokens as findall over the re-joined words: a \w+ token never spans a space
+        findall = self.pattern.findall
+        return [token for word in text.lower().split() if word not in self.stop_words for token in findall(word)]
+
+    def tokenize_series(self, keywords):
+        """Mots de toute une colonne, indexés par la ligne d'origine"""
+        tokens = keywords.fillna('').astype(str).str.lower().str.split().explode().dropna()
+        tokens = tokens[~tokens.isin(self.stop_words)]
+        # Words repeat a lot across keywords: the regex only runs once per distinct word
+        codes, uniques = pd.factorize(tokens)
+        findall = self.pattern.findall
+        pieces = np.empty(len(uniques), dtype=object)
+        pieces[:] = [findall(word) for word in uniques]
+        return pd.Series(pieces[codes], index=tokens.index, dtype=object).explode().dropna()
+
+
+@lru_cache(maxsize=None)
+def _cached_tokenizer(language, extra_stopwords):
+    return KeywordTokenizer(language, extra_stopwords)
+
+
+def get_tokenizer(language='english', extra_stopwords=()):
+    return _cached_tokenizer(language, frozenset(extra_stopwords))
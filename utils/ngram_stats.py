@@ -0,0 +1,50 @@
+# This Python file uses the following encoding: utf-8
+import pandas as pd
+
+
+def extract_ngrams(words, n):
+    """N-grammes de mots consécutifs d'une même ligne.
+
+    `words` est la sortie de KeywordTokenizer.tokenize_series (un mot par ligne de la
+    Series, indexé par la ligne d'origine et dans l'ordre) ; le résultat garde cet index.
+    """
+    if n == 1:
+        return words
+    values = words.to_numpy(dtype=object)
+    rows = words.index.to_numpy()
+    count = len(values) - n + 1
+    if count <= 0:
+        return pd.Series([], dtype=object)
+    # Words of a row are contiguous: first and last word in the same row means the whole n-gram is
+    same_row = rows[n - 1:] == rows[:count]
+    grams = values[:count]
+    for offset in range(1, n):
+        grams = grams + " " + values[offset:offset + count]
+    return pd.Series(grams[same_row], index=rows[:count][same_row], dtype=object)
+
+
+class HeavyHitters:
+    """Résumé Misra-Gries à `capacity` compteurs, fusionnable chunk par chunk.
+
+    Tout n-gramme absent du résumé apparaît au plus `error` fois : un top dont le dernier
+    compte exact dépasse `error` est donc exact. La mémoire reste bornée par `capacity`,
+    quel que soit le nombre de n-grammes distincts.
+    """
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.counts = pd.Series([], dtype="int64")
+        self.error = 0
+
+    def update(self, items):
+        chunk_counts = items.value_counts()
+        counts = self.counts.add(chunk_counts, fill_value=0).astype("int64")
+        if len(counts) > self.capacity:
+            # Mergeable summary: subtract the (capacity + 1)-th largest count from every counter
+            threshold = int(counts.nlargest(self.capacity + 1).iloc[-1])
+            counts = counts[counts > threshold] - threshold
+            self.error += threshold
+        self.counts = counts
+
+    def candidates(self):
+        return self.counts.index
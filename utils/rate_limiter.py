@@ -0,0 +1,149 @@
+# This Python file uses the following encoding: utf-8
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Token bucket partagé entre threads, les appelants sont servis dans leur ordre d'arrivée"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._waiting = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+        self._throttled = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting += 1
+            try:
+                while True:
+                    if ticket != self._serving:
+                        self._condition.wait()
+                        continue
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._blocked_until - now
+                    if delay <= 0 and self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    if delay <= 0:
+                        delay = (1 - self.tokens) / self.rate
+                    self._condition.wait(delay)
+            finally:
+                self._waiting -= 1
+                if ticket == self._serving:
+                    self._serving += 1
+                else:
+                    # Interrupted while queued, the ticket must not block the others
+                    self._abandoned.add(ticket)
+                while self._serving in self._abandoned:
+                    self._abandoned.discard(self._serving)
+                    self._serving += 1
+                self._condition.notify_all()
+            wait = time.monotonic() - start
+            self._acquired += 1
+            self._total_wait += wait
+            self._last_wait = wait
+            self._max_wait = max(self._max_wait, wait)
+        return wait
+
+    def block_for(self, seconds):
+        # Called on a 429: nobody gets a token before the server is ready again
+        with self._condition:
+            self._throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self._condition.notify_all()
+
+    def configure(self, rate=None, burst=None):
+        with self._condition:
+            self._refill(time.monotonic())
+            if rate is not None:
+                self.rate = float(rate)
+            if burst is not None:
+                self.capacity = float(burst)
+                self.tokens = min(self.tokens, self.capacity)
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                "rate": self.rate,
+                "burst": self.capacity,
+                "queue_depth": self._waiting,
+                "acquired": self._acquired,
+                "throttled": self._throttled,
+                "avg_wait": self._total_wait / self._acquired if self._acquired else 0.0,
+                "max_wait": self._max_wait,
+                "last_wait": self._last_wait,
+                "blocked_for": max(self._blocked_until - time.monotonic(), 0.0)
+            }
+
+
+# Requests per second and burst size for each rate limited host
+DEFAULT_LIMITS = {
+    "api.botify.com": (10, 20),
+    "app.botify.com": (2, 5)
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host):
+    with _limiters_lock:
+        if host not in _limiters and host in DEFAULT_LIMITS:
+            _limiters[host] = TokenBucket(*DEFAULT_LIMITS[host])
+        return _limiters.get(host)
+
+
+def configure_limiter(host, rate, burst=None):
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            _limiters[host] = TokenBucket(rate, burst or rate)
+        else:
+            limiter.configure(rate, burst)
+        return _limiters[host]
+
+
+def get_limiter_stats():
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {host: limiter.get_stats() for host, limiter in limiters.items()}
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
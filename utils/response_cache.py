@@ -0,0 +1,135 @@
+# This Python file uses the following encoding: utf-8
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class ResponseCache:
+    """Cache LRU en mémoire, avec un second niveau sqlite optionnel, pour les réponses de l'API.
+
+    Les entrées sont rattachées à un endpoint (qui fixe leur TTL) et à un scope
+    (le projet) : l'apparition d'une nouvelle analyse invalide tout le scope. Les
+    réponses sont gardées en JSON : chaque lecture renvoie une copie que l'appelant
+    peut modifier sans toucher au cache.
+    """
+
+    DEFAULT_TTLS = {
+        "lastAnalysis": 300,
+        "analysisSummary": 24 * 3600,
+        "collections": 3600,
+        "collectionDetail": 3600
+    }
+
+    def __init__(self, max_entries=512, ttls=None, default_ttl=600, db_path=None):
+        self.max_entries = max_entries
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self._memory = OrderedDict()
+        self._analyses = {}
+        self._lock = threading.RLock()
+        self._stats = defaultdict(lambda: {"hits": 0, "disk_hits": 0, "misses": 0})
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries ("
+                             "key TEXT PRIMARY KEY, endpoint TEXT, scope TEXT, expires REAL, value TEXT)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS analyses (scope TEXT PRIMARY KEY, slug TEXT)")
+            self._db.commit()
+            self._analyses.update(self._db.execute("SELECT scope, slug FROM analyses").fetchall())
+
+    @staticmethod
+    def make_key(method, url, body=None):
+        return hashlib.sha1("{0} {1}\n{2}".format(method, url, body or "").encode("utf-8")).hexdigest()
+
+    def lookup(self, key, endpoint):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self._stats[endpoint]["hits"] += 1
+                return True, json.loads(entry[3])
+            if entry:
+                del self._memory[key]
+            if self._db:
+                row = self._db.execute("SELECT expires, endpoint, scope, value FROM entries WHERE key = ?",
+                                       (key,)).fetchone()
+                if row and row[0] > now:
+                    self._remember(key, tuple(row))
+                    self._stats[endpoint]["disk_hits"] += 1
+                    return True, json.loads(row[3])
+            self._stats[endpoint]["misses"] += 1
+            return False, None
+
+    def store(self, key, value, endpoint, scope=None):
+        expires = time.time() + self.ttls.get(endpoint, self.default_ttl)
+        # Serialized now: later changes to `value` by the caller do not reach the cache
+        value = json.dumps(value)
+        with self._lock:
+            self._remember(key, (expires, endpoint, scope, value))
+            if self._db:
+                self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                                 (key, endpoint, scope, expires, value))
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def track_analysis(self, scope, slug, keep_key=None):
+        """Invalide le scope si `slug` est une nouvelle analyse, renvoie True dans ce cas"""
+        with self._lock:
+            previous = self._analyses.get(scope)
+            if previous == slug:
+                return False
+            self._analyses[scope] = slug
+            if self._db:
+                self._db.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?)", (scope, slug))
+                self._db.commit()
+            if previous is not None:
+                self.invalidate(scope=scope, keep_key=keep_key)
+                return True
+            return False
+
+    def invalidate(self, scope=None, endpoint=None, keep_key=None):
+        with self._lock:
+            for key in list(self._memory):
+                _, entry_endpoint, entry_scope, _ = self._memory[key]
+                if key == keep_key:
+                    continue
+                if (scope is None or entry_scope == scope) and (endpoint is None or entry_endpoint == endpoint):
+                    del self._memory[key]
+            if self._db:
+                query = "DELETE FROM entries WHERE key != ?"
+                params = [keep_key or ""]
+                if scope is not None:
+                    query += " AND scope = ?"
+                    params.append(scope)
+                if endpoint is not None:
+                    query += " AND endpoint = ?"
+                    params.append(endpoint)
+                self._db.execute(query, params)
+                self._db.commit()
+
+    def clear(self):
+        self.invalidate()
+
+    def get_stats(self):
+        with self._lock:
+            stats = {endpoint: dict(values) for endpoint, values in self._stats.items()}
+            stats["_total"] = {
+                name: sum(values[name] for values in self._stats.values())
+                for name in ("hits", "disk_hits", "misses")
+            }
+            stats["_total"]["entries"] = len(self._memory)
+            return stats
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,311 @@
+# This Python file uses the following encoding: utf-8
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+RobotsRule = namedtuple("RobotsRule", ["allow", "pattern", "line"])
+RobotsVerdict = namedtuple("RobotsVerdict", ["url", "allowed", "rule"])
+
+# Characters kept as is when normalizing paths and patterns (percent-encoding is upper-cased)
+_SAFE_CHARS = "/?&=;:@+,!~'()[]*$%"
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+# Anything quote() would change, and percent-escapes
+_NEEDS_NORMALIZING = re.compile(r"[^A-Za-z0-9\-._~/?&=;:@+,!'()\[\]*$]")
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+# Path and query of an absolute or relative URL, without the fragment
+_URL_PATH = re.compile(r"(?:[A-Za-z][A-Za-z0-9+.-]*:)?(?://[^/?#]*)?([^#]*)")
+
+
+def _unescape(match):
+    # Only unreserved characters are decoded: %2F is not a path separator, %2A not a wildcard
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else "%" + match.group(1).upper()
+
+
+def normalize_path(value):
+    if _NEEDS_NORMALIZING.search(value) is None:
+        return value
+    return quote(_ESCAPE.sub(_unescape, value), safe=_SAFE_CHARS)
+
+
+def url_path(url):
+    """Partie d'une URL comparée aux règles : chemin et query string"""
+    path = _URL_PATH.match(url.strip()).group(1)
+    if path.find("?") == len(path) - 1:
+        # An empty query string is dropped
+        path = path[:-1]
+    if not path.startswith("/"):
+        path = "/" + path
+    return normalize_path(path)
+
+
+def parse_robots(robots_content):
+    """Découpe un robots.txt en groupes [(user-agents, règles)] dans l'ordre du fichier"""
+    groups = []
+    agents = []
+    rules = None
+    for line_number, raw_line in enumerate(robots_content.splitlines(), 1):
+        line = raw_line.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key = key.strip().lower()
+        value = value.strip()
+        if key == "user-agent":
+            if rules is not None:
+                # A user-agent line after rules starts a new group
+                groups.append((agents, rules))
+                agents, rules = [], None
+            agents.append(value.lower())
+        elif key in ("allow", "disallow"):
+            if not agents:
+                continue
+            if rules is None:
+                rules = []
+            if value:
+                rules.append(RobotsRule(key == "allow", normalize_path(value),
+                                        f"{line_number}: {key.capitalize()}: {value}"))
+    if agents:
+        groups.append((agents, rules or []))
+    return groups
+
+
+def select_rules(groups, user_agent):
+    """Règles applicables : le groupe au token le plus spécifique, sinon '*'"""
+    user_agent = user_agent.lower()
+    best_token = None
+    for agents, _ in groups:
+        for token in agents:
+            if token != "*" and token in user_agent and (best_token is None or len(token) > len(best_token)):
+                best_token = token
+    best_token = best_token or "*"
+    # Groups declared for the same agent are merged
+    return best_token, [rule for agents, rules in groups if best_token in agents for rule in rules]
+
+
+class RobotsMatcher:
+    """Règles d'un robots.txt compilées pour un user-agent (sémantique Google).
+
+    La règle la plus longue l'emporte, Allow gagne en cas d'égalité. Les préfixes
+    littéraux sont rangés par longueur dans des dicts (une recherche par longueur
+    distincte), seules les règles avec `*` ou `$` passent par une expression régulière.
+    """
+
+    def __init__(self, robots_content, user_agent, groups=None):
+        # `groups` lets already parsed rules (from a cache) skip parsing
+        self.robots_content = robots_content
+        self.user_agent = user_agent
+        self.groups = groups if groups is not None else parse_robots(robots_content)
+        self.group, rules = select_rules(self.groups, user_agent)
+        self._prefixes = {}
+        self._exact = {}
+        wildcards = []
+        for rule in rules:
+            pattern = rule.pattern
+            if "*" not in pattern and not pattern.endswith("$"):
+                self._keep(self._prefixes.setdefault(len(pattern), {}), pattern, rule)
+            elif "*" not in pattern:
+                self._keep(self._exact, pattern[:-1], rule)
+            else:
+                wildcards.append((len(pattern), rule.allow, self._compile(pattern), rule))
+        self._lengths = sorted(self._prefixes, reverse=True)
+        # Longest first, Allow before Disallow: the scan stops at the first pattern that cannot win
+        self._wildcards = sorted(wildcards, key=lambda item: (-item[0], not item[1]))
+
+    @staticmethod
+    def _keep(table, key, rule):
+        current = table.get(key)
+        if current is None or (rule.allow and not current.allow):
+            table[key] = rule
+
+    @staticmethod
+    def _compile(pattern):
+        anchored = pattern.endswith("$")
+        if anchored:
+            pattern = pattern[:-1]
+        regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+        return re.compile(regex + ("$" if anchored else "")).match
+
+    @staticmethod
+    def _better(rule, length, best, best_length):
+        return best is None or length > best_length or (length == best_length and rule.allow and not best.allow)
+
+    def match_path(self, path):
+        """Renvoie la règle retenue pour un chemin normalisé, ou None"""
+        if path == "/robots.txt":
+            return None
+        best, best_length = None, -1
+        for length in self._lengths:
+            if length <= len(path):
+                rule = self._prefixes[length].get(path[:length])
+                if rule is not None:
+                    best, best_length = rule, length
+                    break
+        rule = self._exact.get(path)
+        if rule is not None and self._better(rule, len(rule.pattern), best, best_length):
+            best, best_length = rule, len(rule.pattern)
+        for length, allow, match, rule in self._wildcards:
+            if length < best_length or (length == best_length and (best.allow or not allow)):
+                break
+            if match(path):
+                best, best_length = rule, length
+                break
+        return best
+
+    def match(self, url):
+        rule = self.match_path(url_path(url))
+        return RobotsVerdict(url, rule is None or rule.allow, rule.line if rule is not None else None)
+
+    def is_allowed(self, url):
+        rule = self.match_path(url_path(url))
+        return rule is None or rule.allow
+
+    def check(self, urls):
+        for url in urls:
+            url = url.strip()
+            if url:
+                yield self.match(url)
+
+    def check_batch(self, urls, processes=None, chunksize=50000, progress_callback=None):
+        """Évalue une liste d'URLs par lots, éventuellement sur un pool de processus"""
+        urls = [url.strip() for url in urls if url.strip()]
+        chunks = [urls[i:i + chunksize] for i in range(0, len(urls), chunksize)]
+        results = []
+        if processes and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(self.robots_content, self.user_agent, self.groups)) as executor:
+                for done, verdicts in enumerate(executor.map(_check_chunk, chunks), 1):
+                    results.extend(verdicts)
+                    if progress_callback:
+                        progress_callback(int(100 * done / len(chunks)))
+        else:
+            for done, chunk in enumerate(chunks, 1):
+                results.extend(self.match(url) for url in chunk)
+                if progress_callback:
+                    progress_callback(int(100 * done / len(chunks)))
+        return results
+
+
+_worker_matcher = None
+
+
+def _init_worker(robots_content, user_agent, groups):
+    global _worker_matcher
+    _worker_matcher = RobotsMatcher(robots_content, user_agent, groups)
+
+
+def _check_chunk(urls):
+    return [_worker_matcher.match(url) for url in urls]
+
+
+def benchmark(robots_content, user_agent, urls, processes=None):
+    """Compare RobotsMatcher à RobotExclusionRulesParser sur la même liste d'URLs"""
+    from robotexclusionrulesparser import RobotExclusionRulesParser
+
+    urls = [url.strip() for url in urls if url.strip()]
+
+    start = time.perf_counter()
+    parser = RobotExclusionRulesParser()
+    parser.parse(robots_content)
+    reference = [parser.is_allowed(user_agent, url) for url in urls]
+    parser_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verdicts = RobotsMatcher(robots_content, user_agent).check_batch(urls, processes=processes)
+    matcher_time = time.perf_counter() - start
+
+    return {
+        "urls": len(urls),
+        "parser_seconds": round(parser_time, 4),
+        "matcher_seconds": round(matcher_time, 4),
+        "speedup": round(parser_time / matcher_time, 2) if matcher_time else None,
+        # The parser does not apply longest-match, differences are expected on overlapping rules
+        "different_verdicts": sum(1 for verdict, allowed in zip(verdicts, reference) if verdict.allowed != allowed)
+    }
+
+
+RobotsChange = namedtuple("RobotsChange", ["url", "user_agent", "allowed_before", "allowed_after",
+                                           "rule_before", "rule_after"])
+
+
+class RobotsDiff:
+    """Compare deux robots.txt (actuel / candidat) pour plusieurs user-agents.
+
+    Chaque fichier n'est analysé qu'une fois et chaque groupe de règles n'est compilé
+    qu'une fois, même si plusieurs user-agents y tombent : les URLs sont parcourues en
+    une seule passe et seuls les verdicts qui changent sont renvoyés.
+    """
+
+    def __init__(self, current_content, candidate_content, user_agents):
+        self.current_content = current_content
+        self.candidate_content = candidate_content
+        self.user_agents = list(user_agents)
+        contents = (current_content, candidate_content)
+        parsed = [parse_robots(content) for content in contents]
+        compiled = {}
+        self.pairs = []
+        # Same pairs as indexes into self.matchers: each compiled matcher runs once per path
+        self._indexes = []
+        for user_agent in self.user_agents:
+            indexes = []
+            for index, (content, groups) in enumerate(zip(contents, parsed)):
+                group, _ = select_rules(groups, user_agent)
+                key = (index, group)
+                if key not in compiled:
+                    compiled[key] = len(compiled), RobotsMatcher(content, user_agent, groups)
+                indexes.append(compiled[key][0])
+            self._indexes.append((user_agent, indexes[0], indexes[1]))
+        self.matchers = [matcher for _, matcher in sorted(compiled.values(), key=lambda item: item[0])]
+        self.pairs = [(user_agent, self.matchers[before], self.matchers[after])
+                      for user_agent, before, after in self._indexes]
+
+    def compare_path(self, path):
+        rules = [matcher.match_path(path) for matcher in self.matchers]
+        allowed = [rule is None or rule.allow for rule in rules]
+        changes = []
+        for user_agent, before, after in self._indexes:
+            if allowed[before] != allowed[after]:
+                changes.append((user_agent, allowed[before], allowed[after],
+                                rules[before].line if rules[before] is not None else None,
+                                rules[after].line if rules[after] is not None else None))
+        return changes
+
+    def changes(self, urls):
+        for url in urls:
+            url = url.strip()
+            if url:
+                for change in self.compare_path(url_path(url)):
+                    yield RobotsChange(url, *change)
+
+    def run(self, urls, processes=None, chunksize=200000, progress_callback=None):
+        urls = [url.strip() for url in urls if url.strip()]
+        chunks = [urls[i:i + chunksize] for i in range(0, len(urls), chunksize)] or [[]]
+        results = []
+        if processes and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_diff_worker,
+                                     initargs=(self.current_content, self.candidate_content,
+                                               self.user_agents)) as executor:
+                for done, changes in enumerate(executor.map(_diff_chunk, chunks), 1):
+                    results.extend(changes)
+                    if progress_callback:
+                        progress_callback(int(100 * done / len(chunks)))
+        else:
+            for done, chunk in enumerate(chunks, 1):
+                results.extend(self.changes(chunk))
+                if progress_callback:
+                    progress_callback(int(100 * done / len(chunks)))
+        return results
+
+
+_worker_diff = None
+
+
+def _init_diff_worker(current_content, candidate_content, user_agents):
+    global _worker_diff
+    _worker_diff = RobotsDiff(current_content, candidate_content, user_agents)
+
+
+def _diff_chunk(urls):
+    return list(_worker_diff.changes(urls))
@@ -0,0 +1,192 @@
+# This Python file uses the following encoding: utf-8
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from utils.http_transport import get_default_transport
+from utils.robots_matcher import RobotsMatcher, RobotsRule, parse_robots
+
+# Google: a 4xx means no restriction, a server error or a network failure blocks everything
+ALLOW_ALL = ""
+DISALLOW_ALL = "User-agent: *\nDisallow: /"
+
+
+class RobotsEntry:
+    def __init__(self, host, content, groups, etag=None, last_modified=None, status=200, fetched_at=0.0):
+        self.host = host
+        self.content = content
+        self.groups = groups
+        self.etag = etag
+        self.last_modified = last_modified
+        self.status = status
+        self.fetched_at = fetched_at
+        # Set after a failed fetch: the host is tried again at that time instead of after the TTL
+        self.retry_at = None
+        self._matchers = {}
+
+    @property
+    def fallback(self):
+        # Rules made up after a failure on the first fetch, never stored on disk
+        return self.status == 0 or self.status >= 500
+
+    def matcher(self, user_agent):
+        if user_agent not in self._matchers:
+            self._matchers[user_agent] = RobotsMatcher(self.content, user_agent, self.groups)
+        return self._matchers[user_agent]
+
+    def groups_json(self):
+        return json.dumps([[agents, [list(rule) for rule in rules]] for agents, rules in self.groups])
+
+    @staticmethod
+    def groups_from_json(value):
+        return [(agents, [RobotsRule(*rule) for rule in rules]) for agents, rules in json.loads(value)]
+
+
+class RobotsRegistry:
+    """Robots.txt par hôte : téléchargés une fois, en parallèle, et gardés en cache.
+
+    Passé le TTL, le fichier est revalidé avec If-None-Match / If-Modified-Since.
+    Avec `db_path`, le contenu et les règles déjà analysées sont conservés entre
+    deux lancements (sqlite). Après une erreur réseau ou un 5xx, la copie en cache est
+    gardée telle quelle (ou tout est bloqué s'il n'y en a pas) et l'hôte est
+    retenté après `error_ttl` ; ce blocage n'est jamais enregistré dans sqlite.
+    """
+
+    def __init__(self, db_path=None, ttl=24 * 3600, headers=None, transport=None, timeout=(5, 15),
+                 max_workers=16, error_ttl=300):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.headers = headers or {}
+        self.transport = transport or get_default_transport()
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS robots ("
+                             "host TEXT PRIMARY KEY, content TEXT, groups TEXT, etag TEXT, "
+                             "last_modified TEXT, status INTEGER, fetched_at REAL)")
+            self._db.commit()
+
+    @staticmethod
+    def host_of(url):
+        parts = urlsplit(url.strip())
+        return f"{parts.scheme or 'https'}://{parts.netloc}"
+
+    def _cached(self, host):
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None and self._db:
+                row = self._db.execute("SELECT content, groups, etag, last_modified, status, fetched_at "
+                                       "FROM robots WHERE host = ?", (host,)).fetchone()
+                if row:
+                    entry = RobotsEntry(host, row[0], RobotsEntry.groups_from_json(row[1]), *row[2:])
+                    self._entries[host] = entry
+            return entry
+
+    def _save(self, entry):
+        with self._lock:
+            self._entries[entry.host] = entry
+            if self._db and not entry.fallback:
+                self._db.execute("INSERT OR REPLACE INTO robots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (entry.host, entry.content, entry.groups_json(), entry.etag,
+                                  entry.last_modified, entry.status, entry.fetched_at))
+                self._db.commit()
+
+    def _fetch(self, host, cached):
+        headers = dict(self.headers)
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        try:
+            response = self.transport.get(host + "/robots.txt", headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            return self._failed(host, cached, 0)
+
+        if response.status_code >= 500:
+            return self._failed(host, cached, response.status_code)
+        if response.status_code == 304 and cached is not None:
+            cached.fetched_at = time.time()
+            cached.retry_at = None
+            return cached
+        if response.status_code >= 400:
+            content = ALLOW_ALL
+        else:
+            content = response.content.decode("utf-8", errors="replace")
+        if cached is not None and cached.content == content:
+            # Same rules: the compiled matchers are kept
+            cached.fetched_at = time.time()
+            cached.retry_at = None
+            cached.etag = response.headers.get("ETag")
+            cached.last_modified = response.headers.get("Last-Modified")
+            return cached
+        return RobotsEntry(host, content, parse_robots(content), response.headers.get("ETag"),
+                           response.headers.get("Last-Modified"), response.status_code, time.time())
+
+    def _failed(self, host, cached, status):
+        # Keep serving a stale copy (and its validators) rather than blocking the whole host
+        if cached is None or cached.fallback:
+            cached = RobotsEntry(host, DISALLOW_ALL, parse_robots(DISALLOW_ALL), status=status, fetched_at=time.time())
+        cached.retry_at = time.time() + self.error_ttl
+        return cached
+
+    def get(self, host):
+        cached = self._cached(host)
+        if cached is not None:
+            expires_at = cached.retry_at if cached.retry_at is not None else cached.fetched_at + self.ttl
+            if expires_at > time.time():
+                return cached
+        entry = self._fetch(host, cached)
+        self._save(entry)
+        return entry
+
+    def get_many(self, hosts):
+        hosts = list(dict.fromkeys(hosts))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(hosts, executor.map(self.get, hosts)))
+
+    def check_urls(self, urls, user_agent, progress_callback=None):
+        """Vérifie chaque URL avec le robots.txt de son hôte, dans l'ordre de la liste"""
+        by_host = OrderedDict()
+        for index, url in enumerate(url.strip() for url in urls):
+            if url:
+                by_host.setdefault(self.host_of(url), []).append((index, url))
+        if progress_callback:
+            progress_callback(10)
+        entries = self.get_many(by_host)
+        if progress_callback:
+            progress_callback(50)
+
+        results = []
+        for host, items in by_host.items():
+            matcher = entries[host].matcher(user_agent)
+            results.extend((index, matcher.match(url)) for index, url in items)
+        results.sort(key=lambda item: item[0])
+        return [verdict for _, verdict in results]
+
+    def invalidate(self, host=None):
+        with self._lock:
+            if host is None:
+                self._entries.clear()
+                if self._db:
+                    self._db.execute("DELETE FROM robots")
+            else:
+                self._entries.pop(host, None)
+                if self._db:
+                    self._db.execute("DELETE FROM robots WHERE host = ?", (host,))
+            if self._db:
+                self._db.commit()
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
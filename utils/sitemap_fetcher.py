@@ -0,0 +1,257 @@
+# This Python file uses the following encoding: utf-8
+import csv
+import gzip
+import io
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+from utils.http_transport import get_default_transport
+from utils.export_stream import GZIP_MAGIC
+from utils.sitemap_parser import iter_sitemap_items, SitemapLoc, SitemapRecord, ParseIssue
+
+
+class SitemapContentError(ValueError):
+    pass
+
+
+class ResponseBody(io.RawIOBase):
+    """Corps d'une réponse urllib3 en flux brut.
+
+    urllib3 marque `raw` comme fermé dès que tout le corps est lu : un BufferedReader posé
+    directement dessus lève alors "read of closed file" au lieu de renvoyer b"". Ici, la
+    fin du corps est une simple fin de flux.
+    """
+
+    def __init__(self, raw):
+        super().__init__()
+        self.raw = raw
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._eof:
+            return 0
+        data = self.raw.read(len(buffer))
+        if not data:
+            self._eof = True
+            return 0
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+class SpoolBudget:
+    """Mémoire partagée par tous les sitemaps d'un crawl pour garder leurs records.
+
+    Une fois le budget épuisé, chaque sitemap qui en demande plus bascule sur un fichier
+    temporaire : la mémoire reste bornée quel que soit le nombre de sitemaps enfants.
+    """
+
+    def __init__(self, size):
+        self.remaining = size
+        self._lock = threading.Lock()
+
+    def take(self, size):
+        with self._lock:
+            if self.remaining < size:
+                return False
+            self.remaining -= size
+            return True
+
+    def give(self, size):
+        with self._lock:
+            self.remaining += size
+
+
+class SitemapEntry:
+    # Memory shared by all the sitemaps of a crawl, taken by blocks of SPOOL_BLOCK
+    SPOOL_BUDGET = 64 * 1024 * 1024
+    SPOOL_BLOCK = 256 * 1024
+
+    def __init__(self, url, depth, budget=None):
+        self.url = url
+        self.name = urlparse(url).path.split('/')[-1]
+        self.depth = depth
+        self.budget = budget or SpoolBudget(self.SPOOL_BUDGET)
+        self.children = []
+        self.issues = []
+        self.error = None
+        self.count = 0
+        self._spool = None
+        self._writer = None
+        self._reserved = 0
+
+    def child(self, url):
+        return SitemapEntry(url, self.depth + 1, self.budget)
+
+    def add(self, record):
+        if self._spool is None:
+            # max_size=0: the spool only goes to disk when the budget is exhausted
+            self._spool = tempfile.SpooledTemporaryFile(max_size=0, mode="w+", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._spool, delimiter="\t")
+        self._writer.writerow(record[:3])
+        self.count += 1
+        if self._reserved is not None and self._spool.tell() > self._reserved:
+            if self.budget.take(self.SPOOL_BLOCK):
+                self._reserved += self.SPOOL_BLOCK
+            else:
+                self._spool.rollover()
+                self._release()
+
+    def _release(self):
+        if self._reserved:
+            self.budget.give(self._reserved)
+        self._reserved = None
+
+    def records(self):
+        if self._spool is None:
+            return
+        self._spool.seek(0)
+        for url, hreflang_url, lang in csv.reader(self._spool, delimiter="\t"):
+            yield SitemapRecord(url, hreflang_url, lang, self.name)
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            self._release()
+        for child in self.children:
+            child.close()
+
+    def flatten(self):
+        # Depth-first in the order of the index, whatever the order of the downloads
+        if not self.children:
+            yield self
+        for child in self.children:
+            yield from child.flatten()
+
+
+class SitemapFetcher:
+    """Télécharge un sitemap index et ses sitemaps enfants en parallèle.
+
+    Les index imbriqués sont suivis jusqu'à `max_depth`, chaque hôte est limité à
+    `max_per_host` requêtes simultanées et les résultats restent dans l'ordre de l'index.
+    """
+
+    def __init__(self, headers=None, transport=None, max_workers=16, max_per_host=8, max_depth=3):
+        self.headers = headers or {}
+        self.transport = transport or get_default_transport()
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.max_depth = max_depth
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def _slot(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def fetch(self, url):
+        response = self.transport.get(url, headers=self.headers, stream=True)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def open_stream(response):
+        """Renvoie (flux binaire, compressé) ; un .xml.gz est décompressé à la volée"""
+        # Content-Encoding is handled by urllib3, gzip files are recognised by their magic bytes
+        response.raw.decode_content = True
+        stream = io.BufferedReader(ResponseBody(response.raw), buffer_size=256 * 1024)
+        if stream.peek(2)[:2] == GZIP_MAGIC:
+            return gzip.GzipFile(fileobj=stream, mode="rb"), True
+        return stream, False
+
+    @staticmethod
+    def looks_like_xml(stream):
+        """Le début du corps (décompressé) est-il un document XML ou une balise de sitemap ?"""
+        head = stream.peek(512)[:512].lstrip(b"\xef\xbb\xbf \t\r\n")
+        # An HTML page also starts with "<": only the XML declaration and sitemap roots are accepted
+        return head.startswith((b"<?xml", b"<urlset", b"<sitemapindex"))
+
+    def parse(self, stream, entry):
+        # Returns the child sitemap URLs of an index, spools the records of an urlset
+        child_urls = []
+        for item in iter_sitemap_items(stream, entry.name):
+            if isinstance(item, SitemapRecord):
+                entry.add(item)
+            elif isinstance(item, SitemapLoc):
+                child_urls.append(item.url)
+            elif isinstance(item, ParseIssue):
+                entry.issues.append(item.message)
+        return child_urls
+
+    def fetch_and_parse(self, url, entry):
+        response = self.fetch(url)
+        try:
+            stream, _ = self.open_stream(response)
+            return self.parse(stream, entry)
+        finally:
+            response.close()
+
+    def _visit(self, entry):
+        try:
+            # The host slot is held while the body is streamed and parsed
+            with self._slot(entry.url):
+                child_urls = self.fetch_and_parse(entry.url, entry)
+        except Exception as e:
+            entry.error = e
+            return []
+        if child_urls and entry.depth >= self.max_depth:
+            entry.error = Exception("Sitemap index nested deeper than {0} levels".format(self.max_depth))
+            return []
+        entry.children = [entry.child(url) for url in child_urls]
+        return entry.children
+
+    def crawl(self, sitemap_url, stream=None, progress_callback=None, progress_range=(30, 100)):
+        """Renvoie l'entrée racine : un urlset, ou un index dont les enfants sont remplis"""
+        root = SitemapEntry(sitemap_url, 0)
+        root.name = "main"
+        if stream is None:
+            children = self.fetch_and_parse(sitemap_url, root)
+        else:
+            children = self.parse(stream, root)
+        root.children = [root.child(url) for url in children]
+        if not root.children:
+            return root
+
+        start, end = progress_range
+        discovered = len(root.children)
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {executor.submit(self._visit, child) for child in root.children}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    completed += 1
+                    nested = future.result()
+                    discovered += len(nested)
+                    running |= {executor.submit(self._visit, child) for child in nested}
+                if progress_callback:
+                    progress_callback(start + int((end - start) * completed / discovered))
+        return root
+
+    def sitemaps(self, root):
+        return list(root.flatten()) if root.children else [root]
+
+    def emit(self, root, sink):
+        """Envoie les records au sink dans l'ordre de l'index, renvoie le nombre de sitemaps lus"""
+        sitemaps = self.sitemaps(root)
+        for sitemap in sitemaps:
+            if sitemap.error is not None:
+                sink.issue(f"Error processing {sitemap.url}: {str(sitemap.error)}")
+                continue
+            for record in sitemap.records():
+                sink.add(record)
+            for message in sitemap.issues:
+                sink.issue(message)
+        return len(sitemaps) if root.children else 0
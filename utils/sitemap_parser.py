@@ -0,0 +1,120 @@
+# This Python file uses the following encoding: utf-8
+import csv
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+SitemapRecord = namedtuple("SitemapRecord", ["url", "hreflang_url", "lang", "sitemap"])
+SitemapLoc = namedtuple("SitemapLoc", ["url"])
+ParseIssue = namedtuple("ParseIssue", ["message", "sitemap"])
+
+RECORD_HEADER = ["URL", "hreflang URL", "hreflang", "Sitemap"]
+XHTML_LINK = '{http://www.w3.org/1999/xhtml}link'
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_sitemap_items(stream, sitemap_name):
+    """Parcourt un sitemap en flux avec iterparse, la mémoire reste constante.
+
+    Produit des SitemapLoc pour un sitemap index, des SitemapRecord (une ligne par
+    couple URL/hreflang) pour un urlset et des ParseIssue pour les entrées invalides.
+    """
+    root = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        name = _local_name(elem.tag)
+        if name == "url":
+            loc = next((child.text for child in elem if _local_name(child.tag) == "loc"), None)
+            if not loc:
+                yield ParseIssue("Error processing URL: missing <loc>", sitemap_name)
+            else:
+                loc = loc.strip()
+                hreflangs = [link for link in elem.iter(XHTML_LINK) if link.get('rel') == 'alternate']
+                if hreflangs:
+                    for link in hreflangs:
+                        yield SitemapRecord(loc, link.get('href') or "", link.get('hreflang') or "", sitemap_name)
+                else:
+                    yield SitemapRecord(loc, "", "", sitemap_name)
+            # Drop the processed entries, the root would keep them alive otherwise
+            root.clear()
+        elif name == "sitemap":
+            loc = next((child.text for child in elem if _local_name(child.tag) == "loc"), None)
+            if loc and loc.strip():
+                yield SitemapLoc(loc.strip())
+            root.clear()
+    if root is None:
+        raise ET.ParseError("Empty sitemap document")
+
+
+class TextSink:
+    """Reproduit la sortie texte historique (lignes séparées par des tabulations)"""
+
+    def __init__(self):
+        self.lines = ["\t".join(RECORD_HEADER)]
+        self.count = 0
+
+    def add(self, record):
+        self.lines.append("\t".join(record))
+        self.count += 1
+
+    def issue(self, message):
+        self.lines.append(message)
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return "\n".join(self.lines)
+
+
+class CsvSink:
+    def __init__(self, file, delimiter=","):
+        self.writer = csv.writer(file, delimiter=delimiter)
+        self.writer.writerow(RECORD_HEADER)
+        self.count = 0
+        self.issues = []
+
+    def add(self, record):
+        self.writer.writerow(record)
+        self.count += 1
+
+    def issue(self, message):
+        self.issues.append(message)
+
+    def close(self):
+        pass
+
+
+class DataFrameChunker:
+    """Regroupe les records en DataFrames de `chunksize` lignes, passés à `on_chunk`"""
+
+    def __init__(self, on_chunk, chunksize=100000):
+        self.on_chunk = on_chunk
+        self.chunksize = chunksize
+        self.buffer = []
+        self.count = 0
+        self.issues = []
+
+    def add(self, record):
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.chunksize:
+            self._flush()
+
+    def issue(self, message):
+        self.issues.append(message)
+
+    def _flush(self):
+        import pandas as pd
+
+        if self.buffer:
+            self.on_chunk(pd.DataFrame.from_records(self.buffer, columns=SitemapRecord._fields))
+            self.buffer = []
+
+    def close(self):
+        self._flush()
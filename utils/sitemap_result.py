@@ -0,0 +1,117 @@
+# This Python file uses the following encoding: utf-8
+import importlib.util
+import pandas as pd
+from utils.sitemap_parser import RECORD_HEADER, SitemapRecord
+from utils.hreflang_validator import HreflangValidator
+
+
+def parquet_available():
+    # pandas writes parquet through either of these engines
+    return any(importlib.util.find_spec(name) is not None for name in ("pyarrow", "fastparquet"))
+
+
+class SitemapResult:
+    """Résultat tabulaire d'une analyse de sitemap (un DataFrame, une ligne par couple URL/hreflang)"""
+
+    COLUMNS = RECORD_HEADER
+
+    def __init__(self, frame, errors=None, sitemap_count=0):
+        self.frame = frame
+        self.errors = errors or []
+        self.sitemap_count = sitemap_count
+        self.hreflang_violations = None
+
+    @classmethod
+    def from_chunks(cls, chunks, errors=None, sitemap_count=0):
+        if chunks:
+            frame = pd.concat(chunks, ignore_index=True)
+        else:
+            frame = pd.DataFrame(columns=list(SitemapRecord._fields))
+        frame.columns = cls.COLUMNS
+        # Few distinct values: categories keep the frame small
+        for column in ("hreflang", "Sitemap"):
+            frame[column] = frame[column].astype("category")
+        return cls(frame, errors, sitemap_count)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def validate_hreflang(self):
+        """Contrôle les clusters hreflang, le détail des erreurs est gardé dans `hreflang_violations`"""
+        self.hreflang_violations = HreflangValidator.from_frame(self.frame).to_frame()
+        return self.hreflang_violations
+
+    def summary(self):
+        frame = self.frame
+        urls = frame["URL"]
+        url_count = urls.nunique()
+        with_hreflang = frame[frame["hreflang"] != ""]
+        coverage = with_hreflang.groupby("hreflang", observed=True)["URL"].nunique()
+        listings = frame[["URL", "Sitemap"]].drop_duplicates()
+        return {
+            "rows": len(frame),
+            "url_count": url_count,
+            "sitemap_count": self.sitemap_count,
+            "errors": len(self.errors),
+            "duplicate_rows": int(frame.duplicated().sum()),
+            "urls_in_several_sitemaps": int(listings["URL"].duplicated().sum()),
+            "hreflang_coverage": {
+                lang: {"urls": int(count), "ratio": round(count / url_count, 4) if url_count else 0.0}
+                for lang, count in coverage.sort_values(ascending=False).items()
+            },
+            "urls_per_sitemap": {
+                str(sitemap): int(count)
+                for sitemap, count in listings.groupby("Sitemap", observed=True)["URL"].count().items()
+            },
+            "hreflang_violations": (
+                {str(kind): int(count) for kind, count in self.hreflang_violations["type"].value_counts().items()}
+                if self.hreflang_violations is not None else {}
+            )
+        }
+
+    def summary_text(self):
+        summary = self.summary()
+        lines = [
+            "Summary:",
+            f"{summary['rows']} URLs processed",
+            f"{summary['url_count']} unique URLs",
+        ]
+        if summary["sitemap_count"]:
+            lines.append(f"{summary['sitemap_count']} sitemaps analyzed")
+        lines.append(f"{summary['duplicate_rows']} duplicate rows, "
+                     f"{summary['urls_in_several_sitemaps']} URLs listed in several sitemaps")
+        if summary["hreflang_coverage"]:
+            lines.append("")
+            lines.append("hreflang\tURLs\tCoverage")
+            for lang, coverage in summary["hreflang_coverage"].items():
+                lines.append(f"{lang}\t{coverage['urls']}\t{coverage['ratio'] * 100:.2f}%")
+        if summary["hreflang_violations"]:
+            lines.append("")
+            lines.append("hreflang issue\tCount")
+            for kind, count in summary["hreflang_violations"].items():
+                lines.append(f"{kind}\t{count}")
+        if summary["urls_per_sitemap"]:
+            lines.append("")
+            lines.append("Sitemap\tURLs")
+            for sitemap, count in summary["urls_per_sitemap"].items():
+                lines.append(f"{sitemap}\t{count}")
+        if self.errors:
+            lines.append("")
+            lines.extend(self.errors)
+        return "\n".join(lines)
+
+    def to_csv(self, path, sep=","):
+        self.frame.to_csv(path, sep=sep, index=False)
+
+    def to_parquet(self, path):
+        if not parquet_available():
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+        self.frame.to_parquet(path, index=False)
+
+    def export(self, path):
+        if path.endswith(".parquet"):
+            self.to_parquet(path)
+        elif path.endswith(".txt"):
+            self.to_csv(path, sep="\t")
+        else:
+            self.to_csv(path)
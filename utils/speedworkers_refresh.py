@@ -0,0 +1,174 @@
+# This Python file uses the following encoding: utf-8
+import hashlib
+import json
+import math
+import os
+import time
+
+
+class RefreshTask:
+    def __init__(self, urls, refreshPriority, device):
+        self.refreshPriority = refreshPriority
+        self.device = device
+        self.urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+        self.done = 0
+        self.batches = 0
+
+    @property
+    def key(self):
+        return "{0}:{1}".format(self.device, self.refreshPriority)
+
+    def extend(self, urls):
+        known = set(self.urls)
+        for url in urls:
+            url = url.strip() if url else url
+            if url and url not in known:
+                known.add(url)
+                self.urls.append(url)
+
+    def fingerprint(self):
+        return hashlib.sha1("\n".join(self.urls).encode("utf-8")).hexdigest()
+
+
+class RefreshScheduler:
+    """Envoie des demandes de refresh SpeedWorkers par batch en suivant le quota renvoyé par l'API.
+
+    Le quota restant (`avail`) de chaque réponse fixe la taille du batch suivant ; on
+    n'attend la fin de la fenêtre que lorsque ce quota est épuisé. Seules les URLs
+    traitées (`processed`) sont comptées : le reste d'un batch incomplet est renvoyé
+    dans la fenêtre suivante. L'avancement est sauvegardé dans `state_path` après
+    chaque batch pour reprendre après un crash.
+    """
+
+    MAX_URLS_PER_BATCH = 999
+
+    def __init__(self, api, state_path=None, window=60, max_batch=MAX_URLS_PER_BATCH, max_retries=3,
+                 sleep=time.sleep):
+        self.api = api
+        self.state_path = state_path
+        self.window = window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.tasks = {}
+        self.results = []
+        self._avail = None
+        self._window_start = None
+
+    def add(self, urls, refreshPriority="low", device="na"):
+        task = RefreshTask(urls, refreshPriority, device)
+        if task.key in self.tasks:
+            self.tasks[task.key].extend(task.urls)
+        else:
+            self.tasks[task.key] = task
+        return self.tasks[task.key]
+
+    def total_batches_left(self, task, sent):
+        return math.ceil((len(task.urls) - task.done - sent) / self.max_batch)
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        for key, saved in state.get("tasks", {}).items():
+            task = self.tasks.get(key)
+            # Only resume a task whose URL list has not changed since the crash
+            if task and saved.get("fingerprint") == task.fingerprint():
+                task.done = min(saved.get("done", 0), len(task.urls))
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        state = {"tasks": {
+            key: {"fingerprint": task.fingerprint(), "done": task.done}
+            for key, task in self.tasks.items()
+        }}
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def _clear_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def _wait_for_quota(self):
+        # Quota exhausted: wait for the end of the current window before sending again
+        elapsed = time.monotonic() - self._window_start if self._window_start else 0
+        if elapsed < self.window:
+            self.sleep(self.window - elapsed)
+        self._avail = None
+        self._window_start = None
+
+    def _batch_size(self, remaining):
+        size = min(self.max_batch, remaining)
+        if self._avail is not None:
+            size = min(size, self._avail)
+        return size
+
+    def _send(self, task, urls):
+        if self._window_start is None:
+            self._window_start = time.monotonic()
+        started = time.monotonic()
+        response = self.api.speedWorkerInventory(urls, '["REFRESH"]', task.refreshPriority, task.device)
+        elapsed = time.monotonic() - started
+        ok = bool(response) and "processed" in response
+        processed = min(max(int(response["processed"]), 0), len(urls)) if ok else 0
+        result = {
+            "task": task.key,
+            "device": task.device,
+            "refreshPriority": task.refreshPriority,
+            "start": task.done,
+            "urls": len(urls),
+            "ok": ok,
+            "received": response.get("received") if response else None,
+            "processed": response.get("processed") if response else None,
+            "short": ok and processed < len(urls),
+            "avail": response.get("avail") if response else None,
+            "message": response.get("message") if response else "Error during Post",
+            "elapsed": round(elapsed, 3)
+        }
+        if result["avail"] is not None:
+            self._avail = max(int(result["avail"]), 0)
+        elif ok:
+            # No quota information, fall back to one batch per window as documented
+            self._avail = 0
+        if result["short"]:
+            # Part of the batch was refused: the quota is gone, the rest goes in the next window
+            self._avail = 0
+        return result, processed
+
+    def pending(self):
+        return sum(len(task.urls) - task.done for task in self.tasks.values())
+
+    def run(self, progress_callback=None):
+        self._load_state()
+        total = sum(len(task.urls) for task in self.tasks.values())
+        for task in self.tasks.values():
+            retries = 0
+            while task.done < len(task.urls):
+                if self._avail == 0:
+                    self._wait_for_quota()
+                size = self._batch_size(len(task.urls) - task.done)
+                urls = task.urls[task.done:task.done + size]
+                result, processed = self._send(task, urls)
+                task.batches += 1
+                result["batch"] = task.batches
+                result["total_batches"] = task.batches + self.total_batches_left(task, processed)
+                self.results.append(result)
+                if processed:
+                    retries = 0
+                    task.done += processed
+                    self._save_state()
+                else:
+                    retries += 1
+                    if retries > self.max_retries:
+                        # Keep the state file so that a new run resumes from here
+                        return self.results
+                    # A failed call usually means the quota is gone, retry in the next window
+                    self._avail = 0
+                if progress_callback and total:
+                    progress_callback(int((total - self.pending()) / total * 100))
+        self._clear_state()
+        return self.results
@@ -1,35 +1,50 @@
 # This Python file uses the following encoding: utf-8
-import re
+import os
 import csv
-import nltk
 import colorsys
 import pandas as pd
 from collections import defaultdict
-from nltk.corpus import stopwords
+from functools import partial
 from utils.file_handlers import FileHandler
+from utils.keyword_tokenizer import get_tokenizer
+from utils.ngram_stats import extract_ngrams, HeavyHitters
 
 class TextAnalyzer:
+    KEYWORD_COLUMNS = ['Keyword', 'Clicks', 'Impressions']
+
+    @staticmethod
+    def load_stopwords(language='english'):
+        return get_tokenizer(language).stop_words
+
     @staticmethod
-    def clean_and_extract_words(text, language='english'):
-        try:
-            stop_words = set(stopwords.words(language))
-        except LookupError:
-            nltk.download(f'stopwords_{language}')
-            stop_words = set(stopwords.words(language))
-            
-        words = text.lower().split()
-        filtered_words = [word for word in words if word not in stop_words]
-        return re.findall(r'\b\w+\b', ' '.join(filtered_words))
+    def clean_and_extract_words(text, language='english', extra_stopwords=()):
+        return get_tokenizer(language, extra_stopwords).tokenize(text)
 
     @staticmethod
-    def analyze_keywords(file_path, language='english', progress_callback=None):
+    def analyze_keywords(file_path, language='english', progress_callback=None, engine='vectorized',
+                         extra_stopwords=(), processes=None):
+        """Statistiques par mot (occurrences, clics, impressions) d'un export de mots-clés.
+
+        `engine="vectorized"` tokenise des colonnes entières avec pandas, `engine="parallel"`
+        répartit ce travail sur plusieurs processus et `engine="python"` conserve l'ancienne
+        boucle ligne par ligne ; tous donnent le même résultat.
+        """
+        if engine == 'parallel':
+            return TextAnalyzer.analyze_keywords_parallel(file_path, language, progress_callback,
+                                                          processes=processes, extra_stopwords=extra_stopwords)
+        if engine == 'vectorized':
+            return TextAnalyzer.analyze_keywords_vectorized(file_path, language, progress_callback,
+                                                            extra_stopwords=extra_stopwords)
+        tokenizer = get_tokenizer(language, extra_stopwords)
+
         word_stats = defaultdict(lambda: {
             'occurrences': 0,
             'total_clicks': 0,
             'total_impressions': 0
         })
 
-        with FileHandler.open_file(file_path) as csvfile:
+        # La progression vient des octets lus : le fichier n'est parcouru qu'une fois
+        with FileHandler.open_stream(file_path, progress_callback) as csvfile:
             reader = csv.reader(csvfile, delimiter=',')
             next(reader)  # Skip sep=,
             headers = next(reader)  # Get headers
@@ -39,15 +54,9 @@ class TextAnalyzer:
             clicks_idx = headers.index('Clicks')
             impressions_idx = headers.index('Impressions')
 
-            # Compter le nombre total de lignes
-            total_rows = sum(1 for _ in reader)
-            csvfile.seek(0)  # Retourner au début du fichier
-            next(reader)  # Skip sep=,
-            next(reader)  # Skip headers
-
             for i, row in enumerate(reader, 1):
                 try:
-                    keywords = TextAnalyzer.clean_and_extract_words(row[keyword_idx], language)
+                    keywords = tokenizer.tokenize(row[keyword_idx])
                     clicks = int(row[clicks_idx])
                     impressions = int(row[impressions_idx])
                     
@@ -55,26 +64,133 @@ class TextAnalyzer:
                         word_stats[word]['occurrences'] += 1
                         word_stats[word]['total_clicks'] += clicks
                         word_stats[word]['total_impressions'] += impressions
-
-                    if progress_callback:
-                        progress = int((i / total_rows) * 100)
-                        progress_callback(progress)
                 except (IndexError, ValueError) as e:
                     print(f"Erreur lors du traitement de la ligne {i}: {str(e)}")
                     continue
 
         return TextAnalyzer.create_word_stats_dataframe(word_stats)
 
+    @staticmethod
+    def keyword_terms(chunk, tokenizer, n=1):
+        """Mots (ou n-grammes) d'un DataFrame Keyword/Clicks/Impressions, indexés par ligne, avec clics et impressions"""
+        clicks = pd.to_numeric(chunk['Clicks'], errors='coerce')
+        impressions = pd.to_numeric(chunk['Impressions'], errors='coerce')
+        # Rows with invalid numbers are skipped, as in the row by row engine
+        valid = clicks.notna() & impressions.notna()
+        terms = extract_ngrams(tokenizer.tokenize_series(chunk['Keyword'][valid]), n)
+        return terms, clicks, impressions
+
+    @staticmethod
+    def aggregate_keyword_chunk(chunk, tokenizer, n=1, keep=None):
+        """Agrège un DataFrame Keyword/Clicks/Impressions en stats par mot (index = mot)
+
+        `n` compte des n-grammes plutôt que des mots, `keep` limite le comptage à ces termes.
+        """
+        words, clicks, impressions = TextAnalyzer.keyword_terms(chunk, tokenizer, n)
+        if keep is not None:
+            words = words[words.isin(keep)]
+
+        frame = pd.DataFrame({
+            'word': words.values,
+            'total_clicks': clicks.loc[words.index].values.astype('int64'),
+            'total_impressions': impressions.loc[words.index].values.astype('int64')
+        })
+        # sort=False keeps the words in order of first appearance, like the dict of the python engine
+        return frame.groupby('word', sort=False).agg(
+            occurrences=('word', 'size'),
+            total_clicks=('total_clicks', 'sum'),
+            total_impressions=('total_impressions', 'sum')
+        )
+
+    @staticmethod
+    def merge_word_stats(partials):
+        partials = [partial for partial in partials if len(partial)]
+        if not partials:
+            return pd.DataFrame(columns=['occurrences', 'total_clicks', 'total_impressions'])
+        return pd.concat(partials).groupby(level=0, sort=False).sum()
+
+    @staticmethod
+    def analyze_keywords_vectorized(file_path, language='english', progress_callback=None, chunksize=500000,
+                                    extra_stopwords=()):
+        tokenizer = get_tokenizer(language, extra_stopwords)
+        partials = [
+            TextAnalyzer.aggregate_keyword_chunk(chunk, tokenizer)
+            for chunk in FileHandler.read_csv_chunks(file_path, usecols=TextAnalyzer.KEYWORD_COLUMNS,
+                                                     dtype={'Keyword': 'str'}, chunksize=chunksize,
+                                                     progress_callback=progress_callback)
+        ]
+        return TextAnalyzer.create_word_stats_dataframe(TextAnalyzer.merge_word_stats(partials))
+
+    @staticmethod
+    def analyze_keywords_parallel(file_path, language='english', progress_callback=None, processes=None,
+                                  extra_stopwords=(), chunksize=500000, min_shard_size=32 * 1024 * 1024):
+        """Version multi-processus : un shard par membre de zip, ou par plage d'octets d'un CSV.
+
+        Chaque processus renvoie ses stats partielles par mot, fusionnées dans l'ordre des
+        shards : le résultat est identique à celui du moteur vectorisé.
+        """
+        processes = processes or os.cpu_count() or 1
+        total_size = sum(part.size for part in FileHandler.input_parts(file_path))
+        # Small files are not worth starting a pool
+        shards = FileHandler.shards(file_path, min(processes, max(total_size // min_shard_size, 1)))
+        if len(shards) < 2:
+            return TextAnalyzer.analyze_keywords_vectorized(file_path, language, progress_callback, chunksize,
+                                                            extra_stopwords)
+        worker = partial(_aggregate_keyword_stream, language=language, extra_stopwords=tuple(extra_stopwords),
+                         chunksize=chunksize)
+        partials = FileHandler.map_shards(shards, worker, processes=processes, progress_callback=progress_callback)
+        return TextAnalyzer.create_word_stats_dataframe(TextAnalyzer.merge_word_stats(partials))
+
+    @staticmethod
+    def analyze_ngrams(file_path, n=2, language='english', remove_stopwords=False, top_k=1000, capacity=None,
+                       progress_callback=None, extra_stopwords=(), chunksize=500000):
+        """Statistiques des n-grammes les plus fréquents (colonne Word = l'expression).
+
+        Première lecture : résumé Misra-Gries borné à `capacity` candidats (10 x top_k par
+        défaut). Seconde lecture : comptage exact des candidats. `df.attrs["exact"]` indique
+        si le top est garanti exact (son dernier compte dépasse l'erreur du résumé).
+        Les stopwords sont gardés par défaut : « near me », « pas cher ».
+        """
+        tokenizer = get_tokenizer(language if remove_stopwords else None, extra_stopwords)
+        summary = HeavyHitters(capacity or top_k * 10)
+
+        def chunks(progress_range):
+            start, end = progress_range
+            callback = None
+            if progress_callback:
+                callback = lambda value: progress_callback(start + value * (end - start) // 100)
+            return FileHandler.read_csv_chunks(file_path, usecols=TextAnalyzer.KEYWORD_COLUMNS,
+                                               dtype={'Keyword': 'str'}, chunksize=chunksize,
+                                               progress_callback=callback)
+
+        for chunk in chunks((0, 50)):
+            summary.update(TextAnalyzer.keyword_terms(chunk, tokenizer, n)[0])
+
+        candidates = summary.candidates()
+        partials = [
+            TextAnalyzer.aggregate_keyword_chunk(chunk, tokenizer, n, keep=candidates)
+            for chunk in chunks((50, 100))
+        ]
+        df = TextAnalyzer.create_word_stats_dataframe(TextAnalyzer.merge_word_stats(partials)).head(top_k)
+        df.attrs["exact"] = summary.error == 0 or (len(df) == top_k and int(df['Occurrences'].iloc[-1]) > summary.error)
+        df.attrs["error"] = summary.error
+        return df
+
     @staticmethod
     def create_word_stats_dataframe(word_stats):
-        df = pd.DataFrame.from_dict(
-            word_stats,
-            orient='index',
-            columns=['occurrences', 'total_clicks', 'total_impressions']
-        ).reset_index()
+        # word_stats: dict {mot: {occurrences, total_clicks, total_impressions}} or DataFrame indexed by word
+        if isinstance(word_stats, pd.DataFrame):
+            df = word_stats[['occurrences', 'total_clicks', 'total_impressions']].reset_index()
+        else:
+            df = pd.DataFrame.from_dict(
+                word_stats,
+                orient='index',
+                columns=['occurrences', 'total_clicks', 'total_impressions']
+            ).reset_index()
 
         df.columns = ['Word', 'Occurrences', 'Total_Clicks', 'Total_Impressions']
-        df = df.sort_values('Occurrences', ascending=False)
+        # Stable sort: ties keep the order of first appearance, whatever the engine
+        df = df.sort_values('Occurrences', ascending=False, kind='stable')
         df['Avg_CTR'] = (df['Total_Clicks'] / df['Total_Impressions'] * 100).round(2)
         
         return df
@@ -149,4 +265,15 @@ class TextAnalyzer:
         {word_items}
     </div>
 </body>
-</html>""" 
\ No newline at end of file
+</html>""" 
+
+
+def _aggregate_keyword_stream(stream, language, extra_stopwords, chunksize):
+    # Runs in a worker process: the tokenizer is memoized there too
+    tokenizer = get_tokenizer(language, extra_stopwords)
+    partials = [
+        TextAnalyzer.aggregate_keyword_chunk(chunk, tokenizer)
+        for chunk in FileHandler.read_stream_chunks(stream, usecols=TextAnalyzer.KEYWORD_COLUMNS,
+                                                    dtype={'Keyword': 'str'}, chunksize=chunksize)
+    ]
+    return TextAnalyzer.merge_word_stats(partials)
@@ -3,9 +3,17 @@ import requests
 import json
 import xml.etree.ElementTree as ET
 from urllib.parse import urlparse, parse_qs
-from robotexclusionrulesparser import RobotExclusionRulesParser
+import io
+import os
+from utils.sitemap_fetcher import SitemapFetcher, SitemapContentError
+from utils.sitemap_parser import iter_sitemap_items, SitemapRecord, ParseIssue, DataFrameChunker
+from utils.sitemap_result import SitemapResult
+from utils.robots_matcher import RobotsMatcher, RobotsDiff
+from utils.robots_registry import RobotsRegistry
 
 class WebAnalyzer:
+    _robots_registry = None
+
     @staticmethod
     def get_headers():
         return {
@@ -17,73 +25,53 @@ class WebAnalyzer:
         }
 
     @staticmethod
-    def analyze_sitemap(sitemap_url, progress_callback=None):
+    def stream_sitemap(sitemap_url, sink, progress_callback=None, max_workers=16, max_per_host=8):
+        """Envoie chaque couple URL/hreflang du sitemap au sink, renvoie le nombre de sitemaps analysés"""
+        if progress_callback:
+            progress_callback(10)  # Download started
+
+        fetcher = SitemapFetcher(WebAnalyzer.get_headers(), max_workers=max_workers,
+                                 max_per_host=max_per_host)
+        response = fetcher.fetch(sitemap_url)
+
+        if progress_callback:
+            progress_callback(20)  # Download started, the body is parsed while it arrives
+
+        content_type = response.headers.get('content-type', '').lower()
         try:
-            if progress_callback:
-                progress_callback(10)  # Download started
-                
-            response = requests.get(sitemap_url, headers=WebAnalyzer.get_headers())
-            response.raise_for_status()
-            
-            if progress_callback:
-                progress_callback(20)  # Download completed
-            
-            content_type = response.headers.get('content-type', '').lower()
-            if 'xml' not in content_type:
-                return f"Error: Content is not valid XML (Content-Type: {content_type})"
-
-            root = ET.fromstring(response.content)
-            namespaces = {
-                'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9',
-                'xhtml': 'http://www.w3.org/1999/xhtml'
-            }
-
-            if progress_callback:
-                progress_callback(30)  # XML parsing completed
-
-            results = ["URL\threflang URL\threflang\tSitemap"]
-            processed_urls = 0
-            total_progress_remaining = 70  # 70% remaining for processing
-
-            if root.tag.endswith('sitemapindex'):
-                sitemaps = root.findall('sm:sitemap', namespaces)
-                total_sitemaps = len(sitemaps)
-                progress_per_sitemap = total_progress_remaining / (total_sitemaps or 1)
-                
-                for i, sitemap in enumerate(sitemaps, 1):
-                    try:
-                        sitemap_url = sitemap.find('sm:loc', namespaces).text
-                        sitemap_name = urlparse(sitemap_url).path.split('/')[-1]
-                        
-                        if progress_callback:
-                            progress_callback(30 + int(i * progress_per_sitemap))
-                            
-                        sitemap_response = requests.get(sitemap_url, headers=WebAnalyzer.get_headers())
-                        sitemap_response.raise_for_status()
-                        sitemap_root = ET.fromstring(sitemap_response.content)
-                        
-                        new_results = WebAnalyzer.process_urlset(sitemap_root, sitemap_name, namespaces)
-                        results.extend(new_results)
-                        processed_urls += len(new_results)
-                        
-                    except Exception as e:
-                        results.append(f"Error processing {sitemap_url}: {str(e)}")
-            else:
-                new_results = WebAnalyzer.process_urlset(root, "main", namespaces)
-                results.extend(new_results)
-                processed_urls += len(new_results)
-                
-                if progress_callback:
-                    progress_callback(100)  # Processing completed
-
-            # Add summary
-            summary = f"\nSummary:\n{processed_urls} URLs processed"
-            if root.tag.endswith('sitemapindex'):
-                summary += f"\n{len(sitemaps)} sitemaps analyzed"
-            
-            results.append(summary)
-            return "\n".join(results)
+            stream, compressed = fetcher.open_stream(response)
+            # A .xml.gz sent with Content-Encoding: gzip arrives decoded under an application/x-gzip type
+            if 'xml' not in content_type and not compressed and not fetcher.looks_like_xml(stream):
+                raise SitemapContentError(f"Content is not valid XML (Content-Type: {content_type})")
+
+            # Child sitemaps are downloaded concurrently, nested indexes included
+            root = fetcher.crawl(sitemap_url, stream, progress_callback)
+        finally:
+            response.close()
+        try:
+            sitemap_count = fetcher.emit(root, sink)
+        finally:
+            root.close()
+            sink.close()
 
+        if progress_callback:
+            progress_callback(100)  # Processing completed
+        return sitemap_count
+
+    @staticmethod
+    def analyze_sitemap(sitemap_url, progress_callback=None, max_workers=16, max_per_host=8):
+        """Renvoie un SitemapResult, ou un message d'erreur si le sitemap n'a pas pu être lu"""
+        try:
+            chunks = []
+            sink = DataFrameChunker(chunks.append)
+            sitemap_count = WebAnalyzer.stream_sitemap(sitemap_url, sink, progress_callback,
+                                                       max_workers, max_per_host)
+            result = SitemapResult.from_chunks(chunks, sink.issues, sitemap_count)
+            result.validate_hreflang()
+            return result
+
+        except SitemapContentError as e:
+            return f"Error: {str(e)}"
         except requests.RequestException as e:
             return f"HTTP request error: {str(e)}"
         except ET.ParseError as e:
@@ -92,28 +80,19 @@ class WebAnalyzer:
             return f"Unexpected error: {str(e)}"
 
     @staticmethod
-    def process_urlset(root, sitemap_name, namespaces):
+    def process_urlset(root, sitemap_name, namespaces=None):
         results = []
-        for url in root.findall('sm:url', namespaces):
-            try:
-                page_url = url.find('sm:loc', namespaces).text
-                hreflangs = url.findall('.//xhtml:link[@rel="alternate"]', namespaces)
-
-                if hreflangs:
-                    for hreflang in hreflangs:
-                        hreflang_url = hreflang.get('href')
-                        hreflang_lang = hreflang.get('hreflang')
-                        results.append(f"{page_url}\t{hreflang_url}\t{hreflang_lang}\t{sitemap_name}")
-                else:
-                    results.append(f"{page_url}\t\t\t{sitemap_name}")
-            except Exception as e:
-                results.append(f"Error processing URL: {str(e)}")
+        for item in iter_sitemap_items(io.BytesIO(ET.tostring(root)), sitemap_name):
+            if isinstance(item, SitemapRecord):
+                results.append("\t".join(item))
+            elif isinstance(item, ParseIssue):
+                results.append(item.message)
         return results
 
     @staticmethod
-    def analyze_robots_txt(url):
+    def analyze_robots_txt(url, timeout=(5, 15)):
         try:
-            response = requests.get(url, headers=WebAnalyzer.get_headers())
+            response = requests.get(url, headers=WebAnalyzer.get_headers(), timeout=timeout)
             response.raise_for_status()
             return response.content.decode('utf-8')
         except Exception as e:
@@ -121,19 +100,37 @@ class WebAnalyzer:
 
     @staticmethod
     def check_urls_against_robots(urls, robots_content, user_agent):
-        parser = RobotExclusionRulesParser()
-        parser.parse(robots_content)
-        
-        results = []
-        for url in urls:
-            url = url.strip()
-            if not url:
-                continue
-                
-            is_allowed = parser.is_allowed(user_agent, url)
-            results.append((url, is_allowed))
-            
-        return results
+        # Rules are compiled once for the user agent, then matched per URL
+        matcher = RobotsMatcher(robots_content, user_agent)
+        return [(verdict.url, verdict.allowed) for verdict in matcher.check(urls)]
+
+    @staticmethod
+    def evaluate_robots(urls, robots_content, user_agent, processes=None, progress_callback=None):
+        """Renvoie un RobotsVerdict (url, autorisée, règle appliquée) par URL"""
+        matcher = RobotsMatcher(robots_content, user_agent)
+        return matcher.check_batch(urls, processes=processes, progress_callback=progress_callback)
+
+    @staticmethod
+    def diff_robots(urls, current_content, candidate_content, user_agents, processes=None, progress_callback=None):
+        """Renvoie les URLs dont le verdict change entre deux robots.txt, pour chaque user-agent"""
+        diff = RobotsDiff(current_content, candidate_content, user_agents)
+        return diff.run(urls, processes=processes, progress_callback=progress_callback)
+
+    @staticmethod
+    def get_robots_registry():
+        # Un seul registre par session, avec le cache disque partagé entre les lancements
+        if WebAnalyzer._robots_registry is None:
+            WebAnalyzer._robots_registry = RobotsRegistry(
+                db_path=os.path.join(os.path.expanduser("~"), ".botifytoolbox_robots.sqlite"),
+                headers=WebAnalyzer.get_headers()
+            )
+        return WebAnalyzer._robots_registry
+
+    @staticmethod
+    def check_urls_by_host(urls, user_agent, registry=None, progress_callback=None):
+        """Vérifie des URLs de plusieurs hôtes, chacune avec le robots.txt de son hôte"""
+        registry = registry or WebAnalyzer.get_robots_registry()
+        return registry.check_urls(urls, user_agent, progress_callback)
 
     @staticmethod
     def decrypt_botify_filter(url):